@@ -0,0 +1,157 @@
+"""Локальна перевірка відповідей квізу без звернення до ChatGPT."""
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Iterable, Optional
+
+# Поріг схожості, з якого відповідь вважається правильною (друкарські помилки)
+MATCH_RATIO = 0.85
+# Поріг схожості, нижче якого відповідь точно неправильна
+MISMATCH_RATIO = 0.5
+
+# Слова, які не впливають на суть відповіді
+STOP_WORDS = {"the", "a", "an", "це", "місто", "річка", "гора", "озеро"}
+
+# Слова, з якими відповідь, що містить правильну, може її заперечувати
+# або перелічувати кілька варіантів ("не Ніл", "Ніл або Амазонка")
+HEDGE_WORDS = {
+    "не", "ні", "нє", "not", "no", "нет",
+    "або", "чи", "і", "й", "та", "or", "and", "или", "и",
+}
+# Розділювачі кількох варіантів у сирому тексті відповіді
+_ALTERNATIVES = re.compile(r"[,;/|]")
+
+_APOSTROPHES = str.maketrans({"’": "'", "ʼ": "'", "`": "'", "‘": "'"})
+_NON_WORD = re.compile(r"[^\w']+")
+_NUMBER = re.compile(r"\d+")
+
+
+def normalize_answer(text: str) -> str:
+    """Приводить відповідь до канонічного вигляду для порівняння."""
+    text = unicodedata.normalize("NFKC", text).lower().translate(_APOSTROPHES)
+    text = text.replace("ё", "е")
+    words = [
+        word.strip("'")
+        for word in _NON_WORD.sub(" ", text).split()
+    ]
+    meaningful = [word for word in words if word and word not in STOP_WORDS]
+    return " ".join(meaningful or words)
+
+
+def judge_answer(
+    user_answer: str, answer: str, aliases: Iterable[str] = ()
+) -> Optional[bool]:
+    """
+    Порівнює відповідь користувача з правильною відповіддю та синонімами.
+
+    Returns:
+        True — правильно, False — неправильно,
+        None — неоднозначно (потрібна перевірка через ChatGPT)
+    """
+    user = normalize_answer(user_answer)
+    if not user:
+        return False
+
+    candidates = {normalize_answer(answer)}
+    candidates.update(normalize_answer(alias) for alias in aliases)
+    candidates.discard("")
+    if not candidates:
+        return None
+
+    if user in candidates:
+        return True
+
+    hedged = bool(_ALTERNATIVES.search(user_answer))
+    verdicts = [
+        _judge_candidate(user, candidate, hedged) for candidate in candidates
+    ]
+    if True in verdicts:
+        return True
+    if None in verdicts:
+        return None
+    return False
+
+
+def edit_distance(first: str, second: str) -> int:
+    """Відстань Левенштейна між двома рядками."""
+    if len(first) < len(second):
+        first, second = second, first
+    previous = list(range(len(second) + 1))
+    for i, char in enumerate(first, 1):
+        current = [i]
+        for j, other in enumerate(second, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char != other),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def _scripts(text: str) -> frozenset:
+    """Системи письма літер тексту ("CYRILLIC", "LATIN", ...)."""
+    return frozenset(
+        unicodedata.name(char, "").split(" ", 1)[0]
+        for char in text if char.isalpha()
+    )
+
+
+def _abbreviates(short: list, words: list) -> bool:
+    """Чи є одне слово short абревіатурою (або її початком) слів words."""
+    if len(short) != 1 or len(words) < 2 or len(short[0]) < 2:
+        return False
+    initials = "".join(word[0] for word in words)
+    return initials.startswith(short[0]) or short[0].startswith(initials)
+
+
+def _judge_candidate(user: str, candidate: str, hedged: bool) -> Optional[bool]:
+    """
+    Порівнює нормалізовану відповідь з одним варіантом правильної.
+
+    hedged — у сирій відповіді кілька варіантів через кому, слеш тощо.
+    """
+    user_numbers = _NUMBER.findall(user)
+    candidate_numbers = _NUMBER.findall(candidate)
+    if user_numbers or candidate_numbers:
+        # Числа порівнюються лише точно: "100" і "1000" схожі як рядки
+        if user_numbers != candidate_numbers:
+            # "сто" проти "100" — вирішує ChatGPT
+            return False if user_numbers else None
+
+    user_words = user.split()
+    candidate_words = candidate.split()
+    # Повна відповідь усередині короткої фрази: "мабуть це Ніл"
+    if set(candidate_words) <= set(user_words):
+        extra = set(user_words) - set(candidate_words)
+        if hedged or extra & HEDGE_WORDS:
+            return None
+        if len(user_words) <= len(candidate_words) + 2:
+            return True
+
+    if user_numbers or candidate_numbers:
+        # Однакові числа, але різні слова — без нечіткого прийняття
+        return None
+
+    ratio = SequenceMatcher(None, user, candidate).ratio()
+    if ratio < MISMATCH_RATIO:
+        # Низька схожість рядків ще не означає помилку: частина відповіді
+        # ("Вінчі"), абревіатура ("США") чи інше письмо ("Everest") —
+        # вирішує ChatGPT
+        if (
+            set(user_words) & set(candidate_words)
+            or _scripts(user) != _scripts(candidate)
+            or _abbreviates(user_words, candidate_words)
+            or _abbreviates(candidate_words, user_words)
+        ):
+            return None
+        return False
+    if ratio < MATCH_RATIO:
+        return None
+    if len(candidate_words) == 1 and len(user_words) == 1:
+        # Коротке слово: схожі назви ("Австрія" — "Австралія") відрізняються
+        # на кілька літер, тож друкарська помилка — не більше однієї літери
+        # на п'ять
+        if edit_distance(user, candidate) > max(1, len(candidate) // 5):
+            return None
+    return True
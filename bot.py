@@ -1,8 +1,14 @@
 """Головний файл Telegram бота з інтеграцією ChatGPT."""
+import asyncio
+import base64
+import hashlib
+import hmac
 import logging
+
+# Першим: секундомір запуску охоплює імпорт решти модулів
+from startup import startup_timer
+
 from telegram import (
-    InlineKeyboardButton,
-    InlineKeyboardMarkup,
     Update,
     BotCommand,
     BotCommandScopeDefault,
@@ -10,10 +16,10 @@ from telegram import (
 from telegram.ext import (
     Application,
     CommandHandler,
-    CallbackQueryHandler,
     MessageHandler,
     ConversationHandler,
     ContextTypes,
+    TypeHandler,
     filters,
 )
 
@@ -26,7 +32,46 @@ from constants import (
     TRANSLATE_MODE,
     RECOMMENDATIONS_MODE,
 )
-from utils import ResourceLoader
+from utils import ResourceLoader, ImageCache
+from gpt import (
+    close_client,
+    get_client,
+    scheduler,
+    set_request_context,
+    warm_up_connection,
+)
+from pools import quiz_pool, fact_pool, recommendation_pool
+from persistence import SQLitePersistence
+from translation import translation_memory
+from language import language_detector
+from history import load_encoder
+from images import image_store
+from sharding import ShardRouter
+from processing import ChatOrderedUpdateProcessor
+from ratelimit import TelegramRateLimiter, BULK
+from menus import (
+    MAIN_MENU,
+    PERSONALITY_MENU,
+    QUIZ_TOPIC_MENU,
+    LANGUAGE_MENU,
+    CATEGORY_MENU,
+    GENRE_MENUS,
+    START,
+    RANDOM,
+    GPT,
+    TALK,
+    QUIZ,
+    TRANSLATE,
+    RECOMMENDATIONS,
+    GPT_ASK_MORE,
+    QUIZ_NEXT,
+    QUIZ_RESTART,
+    QUIZ_CHANGE,
+    REC_DISLIKE,
+    CallbackRouter,
+    routes,
+    unrouted,
+)
 from handlers import (
     BaseHandler,
     RandomFactHandler,
@@ -37,6 +82,8 @@ from handlers import (
     RecommendationsHandler,
 )
 
+startup_timer.mark("імпорт модулів")
+
 # Налаштування логування
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -44,6 +91,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Опціональний службовий чат для прогріву кешу зображень
+try:
+    from credentials import IMAGE_CACHE_CHAT_ID
+except ImportError:
+    IMAGE_CACHE_CHAT_ID = None
+
+# Файл бази SQLite для даних користувачів та станів розмов
+try:
+    from credentials import DB_PATH
+except ImportError:
+    DB_PATH = None
+
+# Режим webhook (якщо WEBHOOK_URL не вказано, бот працює через polling)
+try:
+    from credentials import WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_PORT
+except ImportError:
+    WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_PORT = None, None, 8443
+
+WEBHOOK_LISTEN = "0.0.0.0"
+WEBHOOK_PATH = "telegram"
+
+# Кількість процесів-воркерів (більше 1 — шардинг оновлень за chat id)
+try:
+    from credentials import WORKERS
+except ImportError:
+    WORKERS = 1
+
+# Скільки оновлень (різних чатів) обробляються одночасно в одному процесі
+try:
+    from credentials import CONCURRENT_UPDATES
+except ImportError:
+    CONCURRENT_UPDATES = 256
+
+# Підпис головного меню під привітанням
+MAIN_MENU_TEXT = "🔸 *Обери, що тебе цікавить:*"
+
 
 class TelegramBot:
     """Головний клас для управління Telegram ботом."""
@@ -52,33 +135,9 @@ class TelegramBot:
         """Ініціалізує бота."""
         self.token = token
         self.application = None
-
-    async def show_main_menu(
-        self, update: Update, context: ContextTypes.DEFAULT_TYPE
-    ) -> None:
-        """Показує головне меню з кнопками."""
-        keyboard = [
-            [
-                InlineKeyboardButton("🎲 Цікавий факт", callback_data="random"),
-                InlineKeyboardButton("🤖 Чат GPT", callback_data="gpt"),
-            ],
-            [
-                InlineKeyboardButton("👤 Чат із зіркою", callback_data="talk"),
-                InlineKeyboardButton("❓ Квіз", callback_data="quiz"),
-            ],
-            [
-                InlineKeyboardButton("🌐 Перекладач", callback_data="translate"),
-                InlineKeyboardButton("🎬 Рекомендації", callback_data="recommendations"),
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        text = "🔸 *Обери, що тебе цікавить:*"
-        target = BaseHandler.get_target(update)
-        if target:
-            await target.reply_text(
-                text, reply_markup=reply_markup, parse_mode="Markdown"
-            )
+        self.background_tasks = []
+        self.update_processor = None
+        self.rate_limiter = None
 
     async def start(
         self, update: Update, context: ContextTypes.DEFAULT_TYPE
@@ -93,17 +152,15 @@ class TelegramBot:
         )
         context.user_data.clear()
 
-        await BaseHandler.send_image(update, context, "main")
-        text = ResourceLoader.load_message("main")
-        
         # Підставляємо ім'я користувача
         user_name = update.effective_user.first_name or "друже"
-        text = text.format(name=user_name)
+        text = ResourceLoader.format_message("main", name=user_name)
 
-        target = BaseHandler.get_target(update)
-        if target:
-            await target.reply_text(text, parse_mode="Markdown")
-        await self.show_main_menu(update, context)
+        # Привітання та головне меню — один екран з фото
+        await BaseHandler.show_screen(
+            update, context, "main",
+            f"{text}\n\n{MAIN_MENU_TEXT}", MAIN_MENU.markup,
+        )
 
         return MENU
 
@@ -117,10 +174,26 @@ class TelegramBot:
         )
         return ConversationHandler.END
 
+    @staticmethod
+    async def tag_request(
+        update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        """Прив'язує запити до OpenAI в межах оновлення до користувача."""
+        user = update.effective_user
+        set_request_context(user.id if user else None)
+
     async def post_init(self, application: Application) -> None:
         """Викликається після ініціалізації."""
-        bot_info = await application.bot.get_me()
-        logger.info(f"Бот запущено: @{bot_info.username}")
+        startup_timer.mark("ініціалізація Application")
+        await self.setup_bot(application)
+        startup_timer.mark("налаштування бота")
+        await self.start_background(application)
+        self.start_image_cache_warm_up(application)
+
+    async def setup_bot(self, application: Application) -> None:
+        """Одноразове налаштування бота в Telegram (команди)."""
+        # Дані бота вже отримано в Application.initialize() (get_me)
+        logger.info(f"Бот запущено: @{application.bot.username}")
 
         commands = [
             BotCommand("start", "Головне меню"),
@@ -131,65 +204,193 @@ class TelegramBot:
         except Exception as e:
             logger.error(f"Помилка встановлення команд: {e}", exc_info=True)
 
-    def _get_cross_mode_handlers(self) -> list:
-        """Повертає список обробників для переходів між режимами."""
-        return [
-            CallbackQueryHandler(
-                RandomFactHandler.handle, pattern="^random$"
-            ),
-            CallbackQueryHandler(
-                GPTHandler.activate_mode, pattern="^gpt$"
+    def start_image_cache_warm_up(self, application: Application) -> None:
+        """
+        Запускає у фоні завантаження зображень у службовий чат.
+
+        З холодним кешем це 24 запити (надіслати й видалити 12 фото) через
+        ліміт чату — до хвилини для групи, тож запуск на них не чекає:
+        бот уже приймає оновлення, і відповіді користувачам ідуть раніше
+        масових надсилань (BULK).
+        """
+        if IMAGE_CACHE_CHAT_ID:
+            self.background_tasks.append(
+                asyncio.create_task(self.warm_up_image_cache(application))
+            )
+
+    @staticmethod
+    async def warm_up_image_cache(application: Application) -> None:
+        """Завантажує в службовий чат зображення без file_id у кеші."""
+        uploaded = await ImageCache.warm_up(
+            application.bot, IMAGE_CACHE_CHAT_ID, rate_limit_args=BULK
+        )
+        logger.info(f"Кеш зображень прогріто: завантажено {uploaded}")
+
+    async def start_background(self, application: Application) -> None:
+        """Завантажує ресурси та запускає фонові завдання процесу."""
+        loop = asyncio.get_running_loop()
+        # Клієнт OpenAI (імпорт SDK) створюється в пулі потоків паралельно
+        # із завантаженням ресурсів; запуск бота на нього не чекає
+        client_ready = loop.run_in_executor(None, get_client)
+        self.background_tasks.append(
+            asyncio.create_task(self.start_model_tasks(client_ready))
+        )
+
+        # Ресурси в пам'яті + фонове перезавантаження змінених файлів
+        ResourceLoader.preload()
+        self.background_tasks.append(
+            asyncio.create_task(ResourceLoader.watch())
+        )
+        startup_timer.mark("ресурси")
+
+        # Модель визначення мови для перекладача
+        language_detector.load()
+        startup_timer.mark("модель визначення мови")
+
+        # Токенізатор (на новому хості tiktoken завантажує BPE з мережі)
+        await loop.run_in_executor(None, load_encoder)
+        startup_timer.mark("токенізатор")
+
+        # Оптимізовані зображення в пам'яті (перекодування — у пулі потоків)
+        await loop.run_in_executor(None, image_store.preload)
+        startup_timer.mark("зображення")
+
+        if self.update_processor is not None:
+            self.background_tasks.append(
+                asyncio.create_task(self.update_processor.log_metrics())
+            )
+        if self.rate_limiter is not None:
+            self.background_tasks.append(
+                asyncio.create_task(self.rate_limiter.log_metrics())
+            )
+        self.background_tasks.append(
+            asyncio.create_task(scheduler.log_metrics())
+        )
+        startup_timer.report()
+
+    async def start_model_tasks(self, client_ready: asyncio.Future) -> None:
+        """Після створення клієнта OpenAI відкриває з'єднання та заповнює пули."""
+        try:
+            await client_ready
+        except Exception as e:
+            logger.error(f"Не вдалося створити клієнт OpenAI: {e}")
+            return
+        logger.info(
+            f"Клієнт OpenAI готовий через "
+            f"{startup_timer.elapsed() * 1000:.0f} мс від запуску"
+        )
+        # Заповнюємо пули питань квізу та фактів у фоні
+        quiz_pool.warm_up(
+            quiz_command for _, quiz_command in QuizHandler.TOPICS.values()
+        )
+        fact_pool.warm_up()
+        # Запити пулів стоять у черзі з фоновим пріоритетом — з'єднання
+        # для першого запиту користувача відкриваємо окремо, без черги
+        await warm_up_connection()
+
+    async def post_shutdown(self, application: Application) -> None:
+        """Викликається після зупинки бота: зупиняє фонові завдання та пул з'єднань OpenAI."""
+        await self.stop_background_tasks()
+        await quiz_pool.close()
+        await fact_pool.close()
+        await recommendation_pool.close()
+        translation_memory.close()
+        await close_client()
+
+    async def stop_background_tasks(self) -> None:
+        """Скасовує фонові завдання процесу."""
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks.clear()
+
+    def _get_cross_mode_routes(self) -> dict:
+        """Маршрути кнопок, доступних у кожному стані (меню та 'Закінчити')."""
+        return {
+            START: self.start,
+            RANDOM: RandomFactHandler.handle,
+            GPT: GPTHandler.activate_mode,
+            TALK: TalkHandler.show_personalities,
+            QUIZ: QuizHandler.show_topics,
+            TRANSLATE: TranslateHandler.show_languages,
+            RECOMMENDATIONS: RecommendationsHandler.show_categories,
+        }
+
+    def build_routers(self) -> dict:
+        """
+        Будує диспетчери callback-запитів для всіх станів розмови.
+
+        Кожен стан отримує один CallbackRouter зі словником
+        callback_data -> обробник; callback id беруться з меню (menus.py).
+        """
+        common = self._get_cross_mode_routes()
+        genre_routes = {}
+        for menu in GENRE_MENUS.values():
+            genre_routes.update(
+                routes(menu, RecommendationsHandler.select_genre)
+            )
+
+        routers = {
+            MENU: CallbackRouter(common),
+            GPT_MODE: CallbackRouter(
+                common, {GPT_ASK_MORE: GPTHandler.ask_more}
             ),
-            CallbackQueryHandler(
-                TalkHandler.show_personalities, pattern="^talk$"
+            TALK_MODE: CallbackRouter(
+                common, routes(PERSONALITY_MENU, TalkHandler.select_personality)
             ),
-            CallbackQueryHandler(
-                QuizHandler.show_topics, pattern="^quiz$"
+            QUIZ_MODE: CallbackRouter(
+                common,
+                routes(QUIZ_TOPIC_MENU, QuizHandler.select_topic),
+                {
+                    QUIZ_NEXT: QuizHandler.next_question,
+                    QUIZ_RESTART: QuizHandler.restart,
+                    QUIZ_CHANGE: QuizHandler.change_topic,
+                },
             ),
-            CallbackQueryHandler(
-                TranslateHandler.show_languages, pattern="^translate$"
+            TRANSLATE_MODE: CallbackRouter(
+                common, routes(LANGUAGE_MENU, TranslateHandler.select_language)
             ),
-            CallbackQueryHandler(
-                RecommendationsHandler.show_categories,
-                pattern="^recommendations$",
+            RECOMMENDATIONS_MODE: CallbackRouter(
+                common,
+                routes(CATEGORY_MENU, RecommendationsHandler.select_category),
+                genre_routes,
+                {REC_DISLIKE: RecommendationsHandler.handle_dislike_button},
             ),
-        ]
+        }
+
+        missing = unrouted(routers.values())
+        if missing:
+            logger.warning(f"Кнопки без обробника: {sorted(missing)}")
+        return routers
 
     def setup_handlers(self) -> ConversationHandler:
         """Налаштовує обробники для бота."""
-        cross_mode = self._get_cross_mode_handlers()
-        start_button = CallbackQueryHandler(self.start, pattern="^start$")
-        common = [start_button] + cross_mode
-        
+        routers = self.build_routers()
+        text = filters.TEXT & ~filters.COMMAND
+
         return ConversationHandler(
+            name="main_conversation",
+            persistent=True,
             entry_points=[CommandHandler("start", self.start)],
             states={
-                MENU: common,
+                MENU: [routers[MENU].handler()],
                 GPT_MODE: [
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, GPTHandler.handle_message),
-                    CallbackQueryHandler(GPTHandler.ask_more, pattern="^gpt_ask_more$"),
-                ] + common,
+                    routers[GPT_MODE].handler(),
+                    MessageHandler(text, GPTHandler.handle_message),
+                ],
                 TALK_MODE: [
-                    CallbackQueryHandler(TalkHandler.select_personality, pattern="^talk_"),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, TalkHandler.handle_message),
-                ] + common,
+                    routers[TALK_MODE].handler(),
+                    MessageHandler(text, TalkHandler.handle_message),
+                ],
                 QUIZ_MODE: [
-                    CallbackQueryHandler(QuizHandler.select_topic, pattern="^quiz_(geography|science|cinema|sport)$"),
-                    CallbackQueryHandler(QuizHandler.next_question, pattern="^quiz_next$"),
-                    CallbackQueryHandler(QuizHandler.restart, pattern="^quiz_restart$"),
-                    CallbackQueryHandler(QuizHandler.change_topic, pattern="^quiz_change$"),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, QuizHandler.handle_answer),
-                ] + common,
+                    routers[QUIZ_MODE].handler(),
+                    MessageHandler(text, QuizHandler.handle_answer),
+                ],
                 TRANSLATE_MODE: [
-                    CallbackQueryHandler(TranslateHandler.select_language, pattern="^lang_"),
-                    CallbackQueryHandler(TranslateHandler.show_languages, pattern="^translate$"),
-                    MessageHandler(filters.TEXT & ~filters.COMMAND, TranslateHandler.handle_message),
-                ] + common,
-                RECOMMENDATIONS_MODE: [
-                    CallbackQueryHandler(RecommendationsHandler.select_category, pattern="^rec_(movies|books|music)$"),
-                    CallbackQueryHandler(RecommendationsHandler.select_genre, pattern="^genre_"),
-                    CallbackQueryHandler(RecommendationsHandler.handle_dislike_button, pattern="^rec_dislike$"),
-                ] + common,
+                    routers[TRANSLATE_MODE].handler(),
+                    MessageHandler(text, TranslateHandler.handle_message),
+                ],
+                RECOMMENDATIONS_MODE: [routers[RECOMMENDATIONS_MODE].handler()],
             },
             fallbacks=[
                 CommandHandler("cancel", self.cancel),
@@ -197,23 +398,123 @@ class TelegramBot:
             ],
         )
 
-    def run(self) -> None:
-        """Запускає бота."""
-        self.application = (
+    def run_webhook(self) -> None:
+        """
+        Запускає вбудований HTTP-сервер для прийому оновлень через webhook.
+
+        Сервер перевіряє заголовок X-Telegram-Bot-Api-Secret-Token, одразу
+        відповідає Telegram і передає оновлення в чергу Application, де
+        вони обробляються асинхронно.
+        """
+        secret_token = WEBHOOK_SECRET or self.derive_webhook_secret(self.token)
+        webhook_url = f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}"
+        logger.info(f"Режим webhook: {webhook_url}, порт {WEBHOOK_PORT}")
+
+        self.application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=int(WEBHOOK_PORT),
+            url_path=WEBHOOK_PATH,
+            webhook_url=webhook_url,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+            drop_pending_updates=True,
+        )
+
+    @staticmethod
+    def derive_webhook_secret(token: str) -> str:
+        """
+        Секрет webhook, похідний від токена бота.
+
+        Усі інстанси за балансувальником обчислюють той самий секрет, тож
+        setWebhook з будь-якого з них не робить решту недійсними (з
+        випадковим секретом кожен інстанс відхиляв би оновлення з 403).
+        """
+        digest = hmac.new(
+            token.encode(), b"telegram-webhook-secret", hashlib.sha256
+        ).digest()
+        # Telegram допускає в секреті лише A-Z, a-z, 0-9, _ та -
+        return base64.urlsafe_b64encode(digest).decode().rstrip("=")
+
+    @staticmethod
+    def create_rate_limiter() -> TelegramRateLimiter:
+        """
+        Створює чергу вихідних запитів процесу.
+
+        Глобальний ліміт Telegram діститься між воркерами, а ліміт чату
+        діє повністю: усі оновлення чату обробляє один воркер.
+        """
+        return TelegramRateLimiter(TelegramRateLimiter.GLOBAL_RATE / WORKERS)
+
+    def build_application(self, updater: bool = True) -> Application:
+        """
+        Створює Application з обробниками та персистентністю.
+
+        Args:
+            updater: False для воркерів, які отримують оновлення не від
+                Telegram, а від фронтового процесу (див. sharding.py)
+        """
+        # Різні чати обробляються паралельно, один чат — строго по черзі
+        self.update_processor = ChatOrderedUpdateProcessor(CONCURRENT_UPDATES)
+        # Усі виклики Bot API проходять через чергу з лімітами Telegram
+        self.rate_limiter = self.create_rate_limiter()
+        builder = (
             Application.builder()
             .token(self.token)
             .post_init(self.post_init)
-            .build()
+            .post_shutdown(self.post_shutdown)
+            .persistence(SQLitePersistence(DB_PATH or "bot_data.sqlite3"))
+            .concurrent_updates(self.update_processor)
+            .rate_limiter(self.rate_limiter)
         )
+        if not updater:
+            builder = builder.updater(None)
+        application = builder.build()
 
+        # Група -1 виконується першою: планувальник OpenAI знає користувача
+        application.add_handler(TypeHandler(Update, self.tag_request), group=-1)
         conv_handler = self.setup_handlers()
-        self.application.add_handler(conv_handler)
+        application.add_handler(conv_handler)
+        startup_timer.mark("побудова Application")
+        return application
+
+    def run_sharded(self) -> None:
+        """Запускає фронтовий процес, що розподіляє оновлення між воркерами."""
+        router = ShardRouter(WORKERS)
+
+        async def front_post_init(application: Application) -> None:
+            await self.setup_bot(application)
+            await router.start()
+            self.start_image_cache_warm_up(application)
+
+        async def front_post_shutdown(application: Application) -> None:
+            await self.stop_background_tasks()
+            await router.stop()
+
+        self.application = (
+            Application.builder()
+            .token(self.token)
+            .post_init(front_post_init)
+            .post_shutdown(front_post_shutdown)
+            .rate_limiter(self.create_rate_limiter())
+            .build()
+        )
+        self.application.add_handler(TypeHandler(Update, router.route))
+
+    def run(self) -> None:
+        """Запускає бота."""
+        if WORKERS > 1:
+            self.run_sharded()
+        else:
+            self.application = self.build_application()
 
         try:
-            self.application.run_polling(
-                allowed_updates=Update.ALL_TYPES,
-                drop_pending_updates=True,
-            )
+            if WEBHOOK_URL:
+                self.run_webhook()
+            else:
+                self.application.run_polling(
+                    allowed_updates=Update.ALL_TYPES,
+                    drop_pending_updates=True,
+                )
         except KeyboardInterrupt:
             logger.info("Бот зупинено")
         except Exception as e:
@@ -11,3 +11,32 @@ ChatGPT_TOKEN = "your_openai_api_key_here"
 # Залиште None або видаліть рядок, якщо проксі не потрібен
 PROXY_URL = None
 
+# Опціонально: службовий чат (id), куди при старті завантажуються зображення,
+# щоб закешувати їхні file_id. Бот має мати право писати в цей чат.
+IMAGE_CACHE_CHAT_ID = None
+
+# Опціонально: файл бази SQLite для даних користувачів та станів розмов
+# (за замовчуванням bot_data.sqlite3 у робочій директорії)
+DB_PATH = None
+
+# Опціонально: режим webhook замість polling.
+# WEBHOOK_URL — публічна HTTPS-адреса (наприклад "https://bot.example.com"),
+# Telegram надсилатиме оновлення на WEBHOOK_URL/telegram.
+# WEBHOOK_SECRET — секрет для заголовка X-Telegram-Bot-Api-Secret-Token
+# (якщо не вказано, виводиться з токена бота — однаковий для всіх інстансів).
+WEBHOOK_URL = None
+WEBHOOK_SECRET = None
+WEBHOOK_PORT = 8443
+
+# Опціонально: кількість процесів-воркерів. Якщо більше 1, фронтовий процес
+# розподіляє оновлення між воркерами за chat id (див. sharding.py)
+WORKERS = 1
+
+# Опціонально: скільки оновлень різних чатів обробляються одночасно
+# (оновлення одного чату завжди обробляються по черзі)
+CONCURRENT_UPDATES = 256
+
+# Опціонально: ліміти облікового запису OpenAI (запитів і токенів на хвилину).
+# Запити понад ліміт чекають у черзі, а не завершуються помилкою 429
+OPENAI_RPM = 500
+OPENAI_TPM = 200000
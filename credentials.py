@@ -8,3 +8,24 @@ load_dotenv()
 # Use uppercase variable names to be conventional in .env files
 ChatGPT_TOKEN = os.getenv('CHATGPT_TOKEN', '')
 BOT_TOKEN = os.getenv('BOT_TOKEN', '')
+
+# Optional: service chat used to pre-upload images and cache their file_id
+IMAGE_CACHE_CHAT_ID = os.getenv('IMAGE_CACHE_CHAT_ID') or None
+
+# Optional: SQLite file for user data and conversation state
+DB_PATH = os.getenv('DB_PATH') or None
+
+# Optional: webhook mode (polling is used when WEBHOOK_URL is empty)
+WEBHOOK_URL = os.getenv('WEBHOOK_URL') or None
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or None
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+
+# Optional: number of worker processes (updates are sharded by chat id when > 1)
+WORKERS = int(os.getenv('WORKERS', '1'))
+
+# Optional: how many updates from different chats are handled concurrently
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '256'))
+
+# Optional: OpenAI account limits (requests and tokens per minute)
+OPENAI_RPM = int(os.getenv('OPENAI_RPM', '500'))
+OPENAI_TPM = int(os.getenv('OPENAI_TPM', '200000'))
@@ -0,0 +1,145 @@
+"""Структури для пошуку майже-дублікатів тексту та обліку показаного."""
+import re
+import random
+import hashlib
+from typing import Iterable, List
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def _hash64(data: str, salt: bytes = b"") -> int:
+    """Стабільний (між перезапусками) 64-бітний хеш рядка."""
+    digest = hashlib.blake2b(data.encode("utf-8"), digest_size=8, salt=salt)
+    return int.from_bytes(digest.digest(), "big")
+
+
+def shingles(text: str, size: int = 4) -> set:
+    """Повертає множину символьних n-грам нормалізованого тексту."""
+    normalized = " ".join(_NON_WORD.sub(" ", text.lower()).split())
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {
+        normalized[i:i + size] for i in range(len(normalized) - size + 1)
+    }
+
+
+class MinHashIndex:
+    """
+    Індекс MinHash + LSH для пошуку майже-дублікатів.
+
+    Тексти з оцінкою подібності Жаккара за шинглами від THRESHOLD
+    вважаються дублікатами. LSH (BANDS смуг по ROWS рядків) дозволяє
+    перевіряти лише кандидатів замість усіх збережених текстів.
+    """
+
+    BANDS = 16
+    ROWS = 4
+    THRESHOLD = 0.5
+
+    _PRIME = (1 << 61) - 1
+
+    def __init__(self, seed: int = 1):
+        """Створює порожній індекс з фіксованими хеш-перестановками."""
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randrange(1, self._PRIME), rng.randrange(0, self._PRIME))
+            for _ in range(self.BANDS * self.ROWS)
+        ]
+        self._buckets = [{} for _ in range(self.BANDS)]
+        self._signatures: List[tuple] = []
+
+    def __len__(self) -> int:
+        """Кількість проіндексованих текстів."""
+        return len(self._signatures)
+
+    def signature(self, text: str) -> tuple:
+        """Обчислює MinHash-сигнатуру тексту."""
+        hashes = [_hash64(shingle) for shingle in shingles(text)] or [0]
+        prime = self._PRIME
+        return tuple(
+            min((a * h + b) % prime for h in hashes)
+            for a, b in self._permutations
+        )
+
+    def _bands(self, signature: tuple) -> Iterable[tuple]:
+        """Розбиває сигнатуру на смуги для LSH."""
+        for band in range(self.BANDS):
+            start = band * self.ROWS
+            yield band, signature[start:start + self.ROWS]
+
+    def add(self, text: str) -> bool:
+        """
+        Додає текст в індекс, якщо він не є майже-дублікатом.
+
+        Returns:
+            True, якщо текст новий і доданий
+        """
+        signature = self.signature(text)
+        if self._find(signature):
+            return False
+
+        doc_id = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in self._bands(signature):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+        return True
+
+    def _find(self, signature: tuple) -> bool:
+        """Шукає серед LSH-кандидатів сигнатуру з подібністю >= THRESHOLD."""
+        checked = set()
+        size = len(signature)
+        for band, key in self._bands(signature):
+            for doc_id in self._buckets[band].get(key, ()):
+                if doc_id in checked:
+                    continue
+                checked.add(doc_id)
+                other = self._signatures[doc_id]
+                same = sum(1 for x, y in zip(signature, other) if x == y)
+                if same / size >= self.THRESHOLD:
+                    return True
+        return False
+
+
+class BloomFilter:
+    """
+    Компактний фільтр Блума для обліку показаних користувачу текстів.
+
+    Займає SIZE_BITS / 8 байт незалежно від кількості елементів і
+    серіалізується разом з context.user_data.
+    """
+
+    SIZE_BITS = 4096
+    HASHES = 4
+
+    __slots__ = ("bits",)
+
+    def __init__(self):
+        """Створює порожній фільтр."""
+        self.bits = bytearray(self.SIZE_BITS // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        """Позиції бітів для елемента (подвійне хешування)."""
+        h1 = _hash64(item)
+        h2 = _hash64(item, salt=b"bloom") | 1
+        for i in range(self.HASHES):
+            yield (h1 + i * h2) % self.SIZE_BITS
+
+    def add(self, item: str) -> None:
+        """Додає елемент у фільтр."""
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        """Перевіряє, чи елемент (імовірно) вже був доданий."""
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(item)
+        )
+
+    def __getstate__(self):
+        """Стан для pickle (клас використовує __slots__)."""
+        return bytes(self.bits)
+
+    def __setstate__(self, state):
+        """Відновлює стан після pickle."""
+        self.bits = bytearray(state)
@@ -1,104 +1,598 @@
 """Модуль для роботи з OpenAI API."""
+import json
+import time
+import hashlib
+import asyncio
 import logging
+import threading
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
 import httpx
-from openai import OpenAI
 from credentials import ChatGPT_TOKEN
+from history import count_tokens, MESSAGE_OVERHEAD
+from utils import FairScheduler, TokenBucket
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, RateLimitError
 
 logger = logging.getLogger(__name__)
 
+# Ліміти пулу HTTP-з'єднань до OpenAI (keep-alive + HTTP/2)
+MAX_CONNECTIONS = 200
+MAX_KEEPALIVE_CONNECTIONS = 50
+KEEPALIVE_EXPIRY = 30.0
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Параметри моделі
+MODEL = "gpt-4o-mini"
+TEMPERATURE = 0.8
+
 # Опціональний проксі сервер (якщо потрібно)
 try:
     from credentials import PROXY_URL
-    http_client = httpx.Client(proxy="http://18.199.183.77:49232") if PROXY_URL else None
 except ImportError:
-    http_client = None
+    PROXY_URL = None
+
+# Ліміти облікового запису OpenAI: запитів і токенів на хвилину
+try:
+    from credentials import OPENAI_RPM, OPENAI_TPM
+except ImportError:
+    OPENAI_RPM, OPENAI_TPM = 500, 200_000
+
+# Кількість процесів-воркерів (sharding.py), що ділять ліміти облікового запису
+try:
+    from credentials import WORKERS
+except ImportError:
+    WORKERS = 1
+
+# Оцінка довжини відповіді для резервування TPM (уточнюється за usage)
+EXPECTED_COMPLETION_TOKENS = 300
+# Пауза після 429, якщо API не вказав Retry-After, та кількість повторів
+RATE_LIMIT_BACKOFF = 5.0
+RATE_LIMIT_RETRIES = 3
+
+# Пріоритети запитів: менше значення обслуговується раніше
+INTERACTIVE = 0  # відповіді користувачу, перевірка відповідей квізу
+BACKGROUND = 1  # поповнення пулів, згортання історії, префетч
+
+# Користувач і пріоритет поточного оновлення (див. set_request_context)
+request_user: ContextVar[Optional[int]] = ContextVar("request_user", default=None)
+request_priority: ContextVar[int] = ContextVar(
+    "request_priority", default=INTERACTIVE
+)
+
+
+def set_request_context(
+    user_id: Optional[int] = None, priority: int = INTERACTIVE
+) -> None:
+    """Позначає запити поточного завдання користувачем і пріоритетом."""
+    request_user.set(user_id)
+    request_priority.set(priority)
+
+
+class RequestScheduler(FairScheduler):
+    """
+    Планувальник запитів до OpenAI з лімітами RPM і TPM.
+
+    Запити, що не вкладаються в ліміти, не падають з 429, а чекають у
+    черзі (FairScheduler). Черги розділені за пріоритетом (інтерактивні
+    раніше фонових), а всередині пріоритету — за користувачами, які
+    обслуговуються по колу, тож один активний користувач не витісняє
+    решту. Ліміти спільні для всіх, тож чекає лише перший у черзі.
+    """
 
-# Ініціалізація клієнта OpenAI з проксі (якщо вказано)
-client = OpenAI(
-    api_key=ChatGPT_TOKEN,
-    http_client=http_client
+    HEAD_OF_LINE = True
+    NAME = "Черга OpenAI"
+    PRIORITY_NAMES = {INTERACTIVE: "інтерактивних", BACKGROUND: "фонових"}
+
+    def __init__(self, rpm: float, tpm: float):
+        """Створює планувальник з лімітами на хвилину."""
+        super().__init__((INTERACTIVE, BACKGROUND))
+        self.requests = TokenBucket(rpm, rpm / 60)
+        self.tokens = TokenBucket(tpm, tpm / 60)
+
+    def _delay(self, user_id: Optional[int], tokens: float) -> float:
+        """Скільки чекати до можливості виконати запит на tokens токенів."""
+        return max(self.requests.delay(1), self.tokens.delay(tokens))
+
+    def _consume(self, user_id: Optional[int], tokens: float) -> None:
+        """Списує запит і зарезервовані токени."""
+        self.requests.consume(1)
+        self.tokens.consume(tokens)
+
+    async def reserve(self, tokens: int, priority: int = None) -> None:
+        """
+        Чекає, доки запит на tokens токенів вкладеться в ліміти.
+
+        Користувач і (за замовчуванням) пріоритет беруться з контексту
+        поточного оновлення (set_request_context).
+        """
+        if priority is None:
+            priority = request_priority.get()
+        # Запит, більший за ємність відра, чекає лише повного відра
+        tokens = min(tokens, self.tokens.capacity)
+        await self.acquire(request_user.get(), tokens, priority)
+
+    def settle(self, reserved: int, used: int) -> None:
+        """Коригує TPM на різницю між зарезервованими і фактичними токенами."""
+        self.tokens.consume(used - reserved)
+
+
+# Кожен воркер має власний планувальник, тож ліміти облікового запису
+# діляться між ними порівну (як глобальний ліміт Telegram у bot.py)
+scheduler = RequestScheduler(
+    OPENAI_RPM / max(WORKERS, 1), OPENAI_TPM / max(WORKERS, 1)
 )
 
 
-def ask_gpt(prompt: str, message: str, history: list = None) -> str:
+class _SharedStream:
+    """Потокова відповідь, яку одночасно читають кілька викликачів."""
+
+    __slots__ = ("chunks", "done", "error", "changed")
+
+    def __init__(self):
+        """Створює порожній буфер фрагментів."""
+        self.chunks = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        """Будить читачів, що чекають на нові фрагменти."""
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def pump(self, chunks: AsyncIterator[str]) -> None:
+        """Читає вихідний потік і зберігає фрагменти для всіх читачів."""
+        try:
+            async for chunk in chunks:
+                self.chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    async def read(self) -> AsyncIterator[str]:
+        """Віддає всі фрагменти з початку, включно з тими, що ще надійдуть."""
+        index = 0
+        while True:
+            changed = self.changed
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await changed.wait()
+
+
+class SingleFlight:
     """
-    Синхронна функція: надсилає запит до OpenAI і повертає текст відповіді.
-    Викликається з bot.py через run_in_executor для асинхронної роботи.
+    Об'єднання однакових запитів, що виконуються одночасно.
+
+    Поки запит з певним ключем (нормалізовані повідомлення + параметри
+    моделі) виконується, інші такі самі запити не йдуть до API, а
+    отримують той самий результат. Для потокових відповідей пізніші
+    викликачі спочатку отримують уже згенеровані фрагменти.
+    """
+
+    def __init__(self):
+        """Створює порожній реєстр запитів у польоті."""
+        self._calls = {}  # key -> asyncio.Task
+        self._streams = {}  # key -> _SharedStream
+        self.requests = 0
+        self.hits = 0
+
+    @staticmethod
+    def key(messages: list, **params) -> str:
+        """Ключ запиту: повідомлення без зайвих пробілів та параметри."""
+        normalized = [
+            [item["role"], " ".join(item["content"].split())]
+            for item in messages
+        ]
+        data = json.dumps(
+            [normalized, MODEL, TEMPERATURE, params],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _count(self, hit: bool) -> None:
+        """Рахує звернення та влучання."""
+        self.requests += 1
+        if hit:
+            self.hits += 1
+            logger.debug(f"Запит об'єднано з однаковим ({self.hits} влучань)")
+
+    async def call(self, key: str, factory):
+        """Виконує factory() або приєднується до однакового запиту в польоті."""
+        task = self._calls.get(key)
+        self._count(task is not None)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # Скасування одного викликача не зупиняє запит для інших
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, factory) -> AsyncIterator[str]:
+        """Потоковий варіант call: factory() повертає async-ітератор."""
+        shared = self._streams.get(key)
+        self._count(shared is not None)
+        if shared is None:
+            shared = _SharedStream()
+            self._streams[key] = shared
+            task = asyncio.ensure_future(shared.pump(factory()))
+            task.add_done_callback(lambda _: self._streams.pop(key, None))
+        return shared.read()
+
+    def stats(self) -> dict:
+        """Лічильники звернень та об'єднаних запитів."""
+        ratio = self.hits / self.requests if self.requests else 0.0
+        return {"requests": self.requests, "hits": self.hits, "hit_ratio": ratio}
+
+
+single_flight = SingleFlight()
+
+# Клієнт OpenAI створюється ліниво: імпорт SDK займає більшу частину
+# часу імпорту бота, а процесам без запитів до моделі (фронт шардингу)
+# він не потрібен зовсім
+_client: Optional["AsyncOpenAI"] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> "AsyncOpenAI":
+    """Повертає клієнт OpenAI, створюючи його (і пул з'єднань) при першому виклику."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import AsyncOpenAI
+
+                # Спільний асинхронний HTTP-клієнт з пулом з'єднань
+                http_client = httpx.AsyncClient(
+                    http2=True,
+                    proxy=PROXY_URL or None,
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONNECTIONS,
+                        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=REQUEST_TIMEOUT,
+                )
+                _client = AsyncOpenAI(
+                    api_key=ChatGPT_TOKEN,
+                    http_client=http_client,
+                )
+    return _client
+
+
+async def warm_up_connection() -> None:
+    """
+    Відкриває з'єднання з OpenAI до першого запиту користувача.
+
+    Легкий запит до API проходить DNS, TLS та HTTP/2 handshake і лишає
+    з'єднання в пулі (keep-alive), тож перший справжній запит не платить
+    за його встановлення.
+
+    Запит іде повз scheduler: models.retrieve не рахується в ліміти
+    RPM/TPM моделі, які той моделює, а в черзі він стояв би за фоновими
+    пакетами пулів і вже не випереджав би першого користувача.
+    """
+    client = get_client()
+    started = time.perf_counter()
+    try:
+        await client.models.retrieve(MODEL)
+    except Exception as e:
+        logger.warning(f"Прогрів з'єднання з OpenAI не вдався: {e}")
+        return
+    logger.info(
+        f"З'єднання з OpenAI відкрито за "
+        f"{(time.perf_counter() - started) * 1000:.0f} мс"
+    )
+
+
+async def close_client() -> None:
+    """Закриває клієнт OpenAI та пул HTTP-з'єднань."""
+    global _client
+    stats = single_flight.stats()
+    logger.info(
+        f"Об'єднання запитів: {stats['hits']} з {stats['requests']} "
+        f"({stats['hit_ratio']:.0%})"
+    )
+    await scheduler.close()
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def build_messages(
+    prompt: str, message: str, history: list = None, summary: str = ""
+) -> list:
+    """Формує список повідомлень для Chat Completions API."""
+    if summary:
+        prompt = f"{prompt}\n\nКороткий зміст попередньої розмови:\n{summary}"
+    messages = [{"role": "system", "content": prompt}]
+
+    # Додаємо історію, якщо вона є
+    if history:
+        messages.extend(history)
+
+    # Додаємо поточне повідомлення
+    messages.append({"role": "user", "content": message})
+    return messages
+
+
+def estimate_request_tokens(messages: list) -> int:
+    """Оцінює токени запиту разом з очікуваною відповіддю (для TPM)."""
+    return EXPECTED_COMPLETION_TOKENS + sum(
+        count_tokens(item["content"]) + MESSAGE_OVERHEAD for item in messages
+    )
+
+
+def _retry_after(error: "RateLimitError") -> float:
+    """Пауза з заголовка Retry-After відповіді 429."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return RATE_LIMIT_BACKOFF
+
+
+async def _create(messages: list, priority: int = None, **kwargs):
+    """
+    Виконує запит через планувальник; при 429 ставить його в чергу знову.
+
+    Returns:
+        (відповідь API, зарезервовані токени)
+    """
+    client = get_client()
+    # SDK уже імпортовано в get_client()
+    from openai import RateLimitError
+
+    reserved = estimate_request_tokens(messages)
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        await scheduler.reserve(reserved, priority)
+        try:
+            response = await client.chat.completions.create(
+                model=MODEL,
+                messages=messages,
+                temperature=TEMPERATURE,
+                **kwargs,
+            )
+            return response, reserved
+        except RateLimitError as e:
+            if attempt == RATE_LIMIT_RETRIES:
+                raise
+            delay = _retry_after(e)
+            logger.warning(f"OpenAI 429, повтор через {delay:.1f} с")
+            scheduler.backoff(delay)
+
+
+async def _complete(messages: list, json_mode: bool, priority: int) -> str:
+    """Один запит Chat Completions без об'єднання."""
+    options = {"response_format": {"type": "json_object"}} if json_mode else {}
+    response, reserved = await _create(messages, priority, **options)
+    if response.usage:
+        scheduler.settle(reserved, response.usage.total_tokens)
+    return response.choices[0].message.content.strip()
+
+
+async def complete(
+    messages: list, json_mode: bool = False, priority: int = None
+) -> str:
+    """
+    Виконує запит Chat Completions і повертає текст відповіді.
+
+    Однакові запити, що виконуються одночасно, об'єднуються в один.
+    На відміну від ask_gpt не перехоплює помилки API.
+    """
+    key = SingleFlight.key(messages, json_mode=json_mode)
+    return await single_flight.call(
+        key, lambda: _complete(messages, json_mode, priority)
+    )
+
+
+async def _stream_completion(messages: list) -> AsyncIterator[str]:
+    """Один потоковий запит Chat Completions без об'єднання."""
+    stream, reserved = await _create(
+        messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    async for chunk in stream:
+        if chunk.usage:
+            scheduler.settle(reserved, chunk.usage.total_tokens)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            yield delta
+
+
+async def ask_gpt(
+    prompt: str,
+    message: str,
+    history: list = None,
+    json_mode: bool = False,
+    summary: str = "",
+    priority: int = None,
+) -> str:
+    """
+    Асинхронна функція: надсилає запит до OpenAI і повертає текст відповіді.
+    Обробники викликають її напряму через await, без пулу потоків.
 
     Args:
         prompt: Системний промпт (роль асистента)
         message: Повідомлення користувача
         history: Історія повідомлень (опціонально)
+        json_mode: Вимагати від моделі відповідь у вигляді JSON-об'єкта
+        summary: Короткий зміст ранішої частини розмови (опціонально)
+        priority: INTERACTIVE або BACKGROUND (за замовчуванням — з контексту)
 
     Returns:
         Відповідь від ChatGPT
     """
     try:
-        messages = [{"role": "system", "content": prompt}]
-        
-        # Додаємо історію, якщо вона є
-        if history:
-            messages.extend(history)
-        
-        # Додаємо поточне повідомлення
-        messages.append({"role": "user", "content": message})
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            temperature=0.8,
+        return await complete(
+            build_messages(prompt, message, history, summary),
+            json_mode,
+            priority,
         )
 
-        answer = response.choices[0].message.content.strip()
-        return answer
-
     except Exception as e:
         logger.error(f"Помилка GPT: {e}")
         return f"⚠️ Помилка при зверненні до ChatGPT: {e}"
 
 
-def generate_random_fact(prompt: str, history_text: str = "") -> str:
-    """Генерує унікальний цікавий факт."""
+async def stream_gpt(
+    prompt: str,
+    message: str,
+    history: list = None,
+    summary: str = "",
+    errors: list = None,
+) -> AsyncIterator[str]:
+    """
+    Потоковий варіант ask_gpt: віддає фрагменти відповіді по мірі генерації.
+
+    Args:
+        prompt: Системний промпт (роль асистента)
+        message: Повідомлення користувача
+        history: Історія повідомлень (опціонально)
+        summary: Короткий зміст ранішої частини розмови (опціонально)
+        errors: Список, куди додається помилка API (опціонально) — щоб
+            викликач не зберігав обірвану відповідь
+
+    Yields:
+        Фрагменти тексту відповіді
+    """
+    messages = build_messages(prompt, message, history, summary)
+    key = SingleFlight.key(messages, stream=True)
+    try:
+        async for delta in single_flight.stream(
+            key, lambda: _stream_completion(messages)
+        ):
+            yield delta
+
+    except Exception as e:
+        logger.error(f"Помилка GPT (stream): {e}")
+        if errors is not None:
+            errors.append(e)
+        yield f"⚠️ Помилка при зверненні до ChatGPT: {e}"
+
+
+async def summarize_conversation(
+    prompt: str, summary: str, messages: list
+) -> str:
+    """
+    Згортає витіснені повідомлення в оновлений короткий зміст розмови.
+
+    Помилки API не перехоплюються: викликач має повернути повідомлення
+    в чергу і спробувати пізніше.
+    """
+    roles = {"user": "Користувач", "assistant": "Асистент"}
+    dialogue = "\n".join(
+        f"{roles.get(item['role'], item['role'])}: {item['content']}"
+        for item in messages
+    )
     message = (
-        "Дай мені цікавий випадковий факт."
-        f"{history_text}\n\n"
-        "ВАЖЛИВО: "
-        "1. Згенеруй НОВИЙ, унікальний факт, який відрізняється від попередніх. "
-        "НЕ повторюй вже показані факти.\n"
-        "2. Факт має бути МАКСИМУМ у 2 реченнях. НЕ більше двох речень. "
-        "Будь коротким та лаконічним."
-    )
-    response = ask_gpt(prompt, message)
-    
-    # Додатково обмежуємо довжину на клієнтській стороні
+        f"Поточний зміст:\n{summary or '(порожньо)'}\n\n"
+        f"Нові повідомлення:\n{dialogue}"
+    )
+    return await complete(build_messages(prompt, message), priority=BACKGROUND)
+
+
+def limit_fact(fact: str) -> str:
+    """Обмежує факт двома реченнями."""
     # Розділяємо на речення та беремо перші 2
-    sentences = response.split('. ')
+    sentences = fact.split('. ')
     if len(sentences) > 2:
         # Беремо перші 2 речення
-        response = '. '.join(sentences[:2])
+        fact = '. '.join(sentences[:2])
         # Додаємо крапку в кінці, якщо її немає
-        if not response.endswith('.'):
-            response += '.'
-    
-    return response
-
+        if not fact.endswith('.'):
+            fact += '.'
+    return fact
 
-def generate_gpt_response(prompt: str, user_text: str, history: list = None) -> str:
-    """Генерує відповідь GPT на запит користувача."""
-    return ask_gpt(prompt, user_text, history)
 
+async def generate_random_fact(prompt: str) -> str:
+    """
+    Генерує один цікавий факт.
 
-def generate_talk_response(prompt: str, user_text: str, history: list = None) -> str:
-    """Генерує відповідь від особистості в режимі діалогу."""
+    Помилки API не перехоплюються: текст помилки не повинен потрапити
+    до спільного пулу фактів.
+    """
     message = (
+        "Дай мені цікавий випадковий факт.\n\n"
+        "ВАЖЛИВО: Факт має бути МАКСИМУМ у 2 реченнях. "
+        "НЕ більше двох речень. Будь коротким та лаконічним."
+    )
+    response = await complete(build_messages(prompt, message))
+
+    # Додатково обмежуємо довжину на клієнтській стороні
+    return limit_fact(response)
+
+
+def _parse_json_field(response: str, key: str) -> Optional[list]:
+    """
+    Витягує список з поля key JSON-відповіді моделі (json_mode).
+
+    Returns:
+        Список або None, якщо JSON некоректний чи поле має іншу форму
+    """
+    try:
+        data = json.loads(response)
+    except ValueError:
+        logger.error(f"Некоректний JSON ({key}): {response[:200]}")
+        return None
+
+    value = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(value, list):
+        logger.warning(f"У відповіді немає списку {key}: {response[:200]}")
+        return None
+    return value
+
+
+async def generate_fact_batch(prompt: str, count: int) -> list:
+    """
+    Генерує пакет різних цікавих фактів одним запитом.
+
+    Returns:
+        Список фактів (кожен не довший за 2 речення)
+    """
+    message = f"Дай мені {count} РІЗНИХ цікавих фактів з різних галузей."
+    response = await ask_gpt(
+        prompt, message, json_mode=True, priority=BACKGROUND
+    )
+
+    facts = _parse_json_field(response, "facts") or []
+    return [limit_fact(str(fact).strip()) for fact in facts if fact]
+
+
+def stream_gpt_response(
+    prompt: str, user_text: str, history: list = None, summary: str = ""
+) -> AsyncIterator[str]:
+    """Потокова відповідь GPT на запит користувача."""
+    return stream_gpt(prompt, user_text, history, summary)
+
+
+def _talk_message(user_text: str) -> str:
+    """Додає до повідомлення інструкцію відповідати коротко."""
+    return (
         f"{user_text}\n\n"
         "ВАЖЛИВО: Відповідай коротко та лаконічно. "
         "Максимум 2-3 речення (не більше 150 слів). "
         "Не пиши довгі абзаци."
     )
-    response = ask_gpt(prompt, message, history)
 
-    # Обмежуємо довжину відповіді (максимум 500 символів)
+
+def limit_talk_response(response: str) -> str:
+    """Обмежує довжину відповіді особистості (максимум 500 символів)."""
     if len(response) > 500:
         truncated = response[:500]
         last_period = truncated.rfind(".")
@@ -116,7 +610,14 @@ def generate_talk_response(prompt: str, user_text: str, history: list = None) ->
     return response
 
 
-def generate_quiz_question(
+def stream_talk_response(
+    prompt: str, user_text: str, history: list = None
+) -> AsyncIterator[str]:
+    """Потокова відповідь особистості (обрізати через limit_talk_response)."""
+    return stream_gpt(prompt, _talk_message(user_text), history)
+
+
+async def generate_quiz_question(
     prompt: str, quiz_command: str, history_text: str = ""
 ) -> str:
     """Генерує питання для квізу."""
@@ -128,15 +629,54 @@ def generate_quiz_question(
         "Згенеруй НОВЕ, унікальне питання, "
         "яке відрізняється від попередніх."
     )
-    return ask_gpt(prompt, message)
+    return await ask_gpt(prompt, message)
+
+
+async def generate_quiz_batch(
+    prompt: str, quiz_command: str, count: int
+) -> list:
+    """
+    Генерує пакет питань квізу з правильними відповідями одним запитом.
 
+    Returns:
+        Список словників {"question": ..., "answer": ..., "aliases": [...]}
+    """
+    message = (
+        f"{quiz_command}\n\n"
+        f"Згенеруй {count} РІЗНИХ питань на цю тему."
+    )
+    response = await ask_gpt(
+        prompt, message, json_mode=True, priority=BACKGROUND
+    )
 
-def check_quiz_answer(
-    prompt: str, question: str, user_answer: str
+    items = []
+    for item in _parse_json_field(response, "questions") or []:
+        if not isinstance(item, dict):
+            continue
+        question = str(item.get("question", "")).strip()
+        answer = str(item.get("answer", "")).strip()
+        aliases = item.get("aliases") or []
+        if not isinstance(aliases, list):
+            aliases = [aliases]
+        if question and answer:
+            items.append({
+                "question": question,
+                "answer": answer,
+                "aliases": [str(alias).strip() for alias in aliases if alias],
+            })
+    return items
+
+
+async def check_quiz_answer(
+    prompt: str, question: str, user_answer: str, correct_answer: str = None
 ) -> str:
     """Перевіряє відповідь на питання квізу."""
+    answer_hint = (
+        f"Правильна відповідь: {correct_answer}\n\n" if correct_answer else ""
+    )
     message = (
         f"Питання: {question}\n\n"
+        f"{answer_hint}"
         f"Відповідь користувача: {user_answer}\n\n"
         "Перевір, чи відповідь правильна. "
         "Якщо правильна або дуже схожа на правильну, "
@@ -144,24 +684,77 @@ def check_quiz_answer(
         "Якщо неправильна, відповідь "
         "'Неправильно! Правильна відповідь - [правильна відповідь]'."
     )
-    return ask_gpt(prompt, message)
+    return await ask_gpt(prompt, message)
 
 
-def translate_text(prompt: str, text: str) -> str:
+async def translate_text(prompt: str, text: str) -> str:
     """Перекладає текст на цільову мову."""
-    return ask_gpt(prompt, text)
+    return await ask_gpt(prompt, text)
 
 
-def generate_recommendation(
-    prompt: str, category_singular: str, genre: str, is_new: bool = False
-) -> str:
-    """Генерує рекомендацію (фільм, книгу або музику)."""
-    new_text = "новий " if is_new else ""
-    message = (
-        f"Дай ТІЛЬКИ ОДИН {new_text}{category_singular} у жанрі {genre}. "
-        "НЕ більше одного."
+def stream_translation(
+    prompt: str, text: str, errors: list = None
+) -> AsyncIterator[str]:
+    """Потоковий переклад тексту на цільову мову (errors — див. stream_gpt)."""
+    return stream_gpt(prompt, text, errors=errors)
+
+
+async def translate_segments(prompt: str, segments: list) -> Optional[list]:
+    """
+    Перекладає список речень одним структурованим запитом.
+
+    Returns:
+        Переклади в тому ж порядку або None, якщо відповідь некоректна
+    """
+    message = json.dumps({"segments": segments}, ensure_ascii=False)
+    response = await ask_gpt(prompt, message, json_mode=True)
+
+    translations = _parse_json_field(response, "translations")
+    if translations is None:
+        return None
+    if len(translations) != len(segments):
+        logger.warning("Кількість перекладених речень не збігається")
+        return None
+    return [str(translation).strip() for translation in translations]
+
+
+async def generate_recommendation_batch(
+    prompt: str,
+    count: int,
+    avoid: list = (),
+    priority: int = None,
+) -> list:
+    """
+    Генерує пакет різних рекомендацій одним структурованим запитом.
+
+    Args:
+        prompt: Системний промпт з категорією, жанром та кількістю
+        count: Скільки рекомендацій потрібно
+        avoid: Назви, які вже є в кеші (щоб не повторюватись)
+        priority: INTERACTIVE або BACKGROUND (за замовчуванням — з контексту)
+
+    Returns:
+        Список словників {"title": ..., "description": ..., "rating": ...}
+    """
+    message = f"Дай {count} РІЗНИХ рекомендацій."
+    if avoid:
+        message += f" Не рекомендуй: {', '.join(avoid)}."
+    response = await ask_gpt(
+        prompt, message, json_mode=True, priority=priority
     )
-    return ask_gpt(prompt, message)
+
+    items = []
+    for item in _parse_json_field(response, "items") or []:
+        if not isinstance(item, dict):
+            continue
+        title = str(item.get("title", "")).strip()
+        if title:
+            items.append({
+                "title": title,
+                "description": str(item.get("description", "")).strip(),
+                "rating": str(item.get("rating") or "").strip(),
+            })
+    return items
 
 
 def extract_first_question(text: str) -> str:
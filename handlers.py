@@ -2,8 +2,16 @@
 import asyncio
 import logging
 from functools import wraps
-
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    Message,
+    Update,
+)
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import ContextTypes
 
 from constants import (
@@ -14,17 +22,44 @@ from constants import (
     TRANSLATE_MODE,
     RECOMMENDATIONS_MODE,
 )
-from utils import ResourceLoader
+from utils import ResourceLoader, ImageCache
+from images import image_store
 from gpt import (
     generate_random_fact,
-    generate_gpt_response,
-    generate_talk_response,
+    stream_gpt_response,
+    stream_talk_response,
+    limit_talk_response,
+    summarize_conversation,
     generate_quiz_question,
     check_quiz_answer,
-    translate_text,
-    generate_recommendation,
+    stream_translation,
     extract_first_question,
 )
+from pools import quiz_pool, fact_pool, recommendation_pool, normalize_title
+from dedup import BloomFilter
+from history import ConversationHistory
+from answers import judge_answer
+from translation import (
+    CHUNK_CHARS,
+    translate_cached,
+    translate_long,
+    remember_translation,
+)
+from language import language_detector, LANGUAGE_NAMES
+from ratelimit import retry_after_seconds
+from menus import (
+    FINISH_MENU,
+    FACT_MENU,
+    GPT_REPLY_MENU,
+    PERSONALITY_MENU,
+    QUIZ_TOPIC_MENU,
+    QUIZ_RESULT_MENU,
+    LANGUAGE_MENU,
+    TRANSLATION_MENU,
+    CATEGORY_MENU,
+    GENRE_MENUS,
+    RECOMMENDATION_MENU,
+)
 from genres import MOVIE_GENRES, BOOK_GENRES, MUSIC_GENRES
 
 logger = logging.getLogger(__name__)
@@ -44,29 +79,113 @@ def answer_callback_query(func):
 class BaseHandler:
     """Базовий клас для обробників."""
 
+    # Мінімальний інтервал між редагуваннями повідомлення під час стрімінгу
+    # (Telegram дозволяє близько одного редагування на секунду в чаті)
+    STREAM_EDIT_INTERVAL = 1.0
+    MESSAGE_LIMIT = 4096
+
+    # Бюджет історії розмови (токенів) для кожного режиму
+    HISTORY_BUDGETS = {
+        "gpt_history": 2000,
+        "talk_history": 1000,
+    }
+
+    # Історії, витіснені повідомлення яких згортаються в короткий зміст
+    SUMMARIZED_HISTORIES = {"gpt_history"}
+
+    # id історій, для яких зараз виконується згортання
+    _compacting = set()
+
+    # Максимальна довжина підпису до фото в Telegram
+    CAPTION_LIMIT = 1024
+
+    @staticmethod
+    async def _with_photo(name: str, image_path: str, send: Callable):
+        """
+        Виконує send(photo) для зображення name.
+
+        Спершу використовується file_id з кешу; якщо його немає або він
+        недійсний, завантажуються оптимізовані байти з пам'яті (images.py),
+        а новий file_id зберігається.
+        """
+        file_id = ImageCache.get(name, image_path)
+        if file_id:
+            try:
+                return await send(file_id)
+            except BadRequest as e:
+                if "file" not in str(e).lower():
+                    raise
+                logger.warning(f"file_id для {name} недійсний: {e}")
+                ImageCache.invalidate(name)
+
+        message = await send(image_store.get(name, image_path))
+        if isinstance(message, Message) and message.photo:
+            ImageCache.put(name, image_path, message.photo[-1].file_id)
+        return message
+
     @staticmethod
-    async def send_image(
+    async def show_screen(
         update: Update,
         context: ContextTypes.DEFAULT_TYPE,
-        name: str
+        name: str,
+        text: str,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        edit: bool = True,
+        parse_mode: Optional[str] = "Markdown",
     ) -> None:
-        """Надсилає зображення."""
-        try:
-            image_path = ResourceLoader.get_image_path(name)
+        """
+        Показує екран: зображення name з підписом text і клавіатурою.
+
+        Екран — одне повідомлення (send_photo з caption та reply_markup).
+        Якщо натиснуто кнопку під іншим екраном, він редагується на місці
+        (edit_media) замість надсилання нового повідомлення; edit=False
+        завжди надсилає новий екран (наприклад, для нового факту).
+        Текст, задовгий для підпису, надсилається звичайним повідомленням.
+        """
+        target = BaseHandler.get_target(update)
+        if not target:
+            return
+
+        image_path = ResourceLoader.get_image_path(name)
+        if not image_path or len(text) > BaseHandler.CAPTION_LIMIT:
             if not image_path:
                 logger.warning(f"Зображення {name} не знайдено")
-                return
+            await target.reply_text(
+                text, reply_markup=reply_markup, parse_mode=parse_mode
+            )
+            return
 
-            target = (
-                update.callback_query.message
-                if update.callback_query
-                else update.message
+        try:
+            if edit and update.callback_query and target.photo:
+                try:
+                    await BaseHandler._with_photo(
+                        name,
+                        image_path,
+                        lambda photo: target.edit_media(
+                            InputMediaPhoto(
+                                photo, caption=text, parse_mode=parse_mode
+                            ),
+                            reply_markup=reply_markup,
+                        ),
+                    )
+                    return
+                except BadRequest as e:
+                    # Застаре чи видалене повідомлення — надсилаємо новий екран
+                    logger.debug(f"Не вдалося відредагувати екран {name}: {e}")
+
+            await BaseHandler._with_photo(
+                name,
+                image_path,
+                lambda photo: target.reply_photo(
+                    photo=photo,
+                    caption=text,
+                    reply_markup=reply_markup,
+                    parse_mode=parse_mode,
+                ),
             )
-            if target:
-                with open(image_path, "rb") as photo:
-                    await target.reply_photo(photo=photo)
         except Exception as e:
-            logger.error(f"Помилка надсилання зображення {name}: {e}", exc_info=True)
+            logger.error(f"Помилка показу екрана {name}: {e}", exc_info=True)
+            await target.reply_text(text, reply_markup=reply_markup)
 
     @staticmethod
     def escape_markdown(text: str) -> str:
@@ -82,16 +201,145 @@ class BaseHandler:
         )
 
     @staticmethod
-    def create_finish_button() -> InlineKeyboardMarkup:
-        """Створює клавіатуру з кнопкою 'Закінчити'."""
-        keyboard = [[InlineKeyboardButton("🏠 Закінчити", callback_data="start")]]
-        return InlineKeyboardMarkup(keyboard)
+    async def single_chunk(text: str) -> AsyncIterator[str]:
+        """Готова відповідь у вигляді потоку з одного фрагмента."""
+        yield text
 
     @staticmethod
-    async def run_gpt(func, *args):
-        """Допоміжна функція для запуску GPT в executor."""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func, *args)
+    def split_message(text: str, limit: int) -> Tuple[str, str]:
+        """
+        Відрізає від тексту початок, що вміщується в limit символів.
+
+        Розрізає по абзацу, рядку, кінцю речення або пробілу (у такому
+        порядку), щоб не рвати слова й речення між повідомленнями.
+
+        Returns:
+            (початок, решта тексту)
+        """
+        if len(text) <= limit:
+            return text, ""
+        window = text[:limit]
+        for separators in (("\n\n",), ("\n",), (". ", "! ", "? ", "… "), (" ",)):
+            cut = max(
+                window.rfind(separator) + len(separator)
+                for separator in separators
+            )
+            # Не відрізаємо надто короткий шматок
+            if cut > limit // 2:
+                return text[:cut].rstrip(), text[cut:].lstrip()
+        return window, text[limit:]
+
+    @staticmethod
+    async def finish_message(
+        chat,
+        message,
+        text: str,
+        header: str = "",
+        markdown: bool = False,
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+    ):
+        """
+        Фінальний вигляд повідомлення (Markdown з запасним варіантом).
+
+        Редагує message або, якщо його ще немає, надсилає нове в chat.
+        """
+        send = message.edit_text if message is not None else chat.send_message
+        try:
+            return await send(
+                f"{header}\n{text}" if header else text,
+                reply_markup=reply_markup,
+                parse_mode="Markdown" if markdown else None,
+            )
+        except BadRequest as e:
+            logger.error(f"Помилка парсингу Markdown: {e}")
+            plain_header = header.replace("*", "")
+            return await send(
+                f"{plain_header}\n{text}" if plain_header else text,
+                reply_markup=reply_markup,
+            )
+
+    @staticmethod
+    async def stream_reply(
+        placeholder,
+        chunks: AsyncIterator[str],
+        header: str = "",
+        reply_markup: Optional[InlineKeyboardMarkup] = None,
+        finalize: Optional[Callable[[str], str]] = None,
+    ) -> str:
+        """
+        Показує потокову відповідь, редагуючи повідомлення-заглушку.
+
+        Проміжні правки йдуть без розмітки (незакритий Markdown ламає
+        парсинг) і не частіше за STREAM_EDIT_INTERVAL. Фінальна правка
+        додає заголовок у Markdown та клавіатуру. Коли текст перестає
+        вміщуватися в MESSAGE_LIMIT, заповнене повідомлення фіксується
+        (розрізане по межі абзацу чи речення), а відповідь продовжується
+        в новому.
+
+        Args:
+            placeholder: Повідомлення "🔄 Генерую відповідь...", яке редагуємо
+            chunks: Фрагменти відповіді від GPT
+            header: Заголовок у Markdown (наприклад "*Курт Кобейн:*")
+            reply_markup: Клавіатура для останнього повідомлення
+            finalize: Обробка тексту останнього повідомлення перед фінальною правкою
+
+        Returns:
+            Повний текст відповіді
+        """
+        loop = asyncio.get_running_loop()
+        chat = placeholder.chat
+        markdown = bool(header)
+        # Запас під заголовок та курсор " ▌"
+        limit = BaseHandler.MESSAGE_LIMIT - len(header) - 3
+        message = placeholder  # None — наступне повідомлення ще не надіслане
+        last = placeholder
+        message_header = header
+        sent = []  # тексти вже зафіксованих повідомлень
+        text = ""
+        next_edit = 0.0
+
+        async for chunk in chunks:
+            text += chunk
+            while len(text) > limit:
+                part, text = BaseHandler.split_message(text, limit)
+                last = await BaseHandler.finish_message(
+                    chat, message, part, message_header, markdown
+                )
+                sent.append(part)
+                message = None
+                message_header = ""
+
+            now = loop.time()
+            if now < next_edit or not text.strip():
+                continue
+            next_edit = now + BaseHandler.STREAM_EDIT_INTERVAL
+
+            plain_header = message_header.replace("*", "")
+            partial = f"{plain_header}\n{text} ▌" if plain_header else f"{text} ▌"
+            try:
+                if message is None:
+                    message = await chat.send_message(partial)
+                else:
+                    await message.edit_text(partial)
+            except RetryAfter as e:
+                next_edit = loop.time() + retry_after_seconds(e)
+            except BadRequest as e:
+                logger.debug(f"Пропущено проміжне редагування: {e}")
+
+        text = text.strip()
+        if not text and not sent:
+            text = "⚠️ ChatGPT повернув порожню відповідь"
+        if finalize and text:
+            text = finalize(text)
+
+        if text:
+            await BaseHandler.finish_message(
+                chat, message, text, message_header, markdown, reply_markup
+            )
+        elif reply_markup is not None:
+            # Уся відповідь уже в попередніх повідомленнях
+            await last.edit_reply_markup(reply_markup=reply_markup)
+        return "\n".join(sent + [text]).strip()
 
     @staticmethod
     def get_target(update: Update):
@@ -103,14 +351,53 @@ class BaseHandler:
         )
 
     @staticmethod
-    def update_history(context: ContextTypes.DEFAULT_TYPE, key: str, user_text: str, response: str, max_pairs: int = 10):
-        """Оновлює історію розмови."""
-        history = context.user_data.get(key, [])
-        history.append({"role": "user", "content": user_text})
-        history.append({"role": "assistant", "content": response})
-        context.user_data[key] = history[-max_pairs * 2:]  # Зберігаємо пари
+    def get_history(
+        context: ContextTypes.DEFAULT_TYPE, key: str
+    ) -> ConversationHistory:
+        """Повертає історію розмови режиму (створює, якщо її немає)."""
+        history = context.user_data.get(key)
+        if history is None:
+            history = ConversationHistory(
+                BaseHandler.HISTORY_BUDGETS.get(key, 1000),
+                summarize=key in BaseHandler.SUMMARIZED_HISTORIES,
+            )
+            context.user_data[key] = history
         return history
 
+    @staticmethod
+    def update_history(context: ContextTypes.DEFAULT_TYPE, key: str, user_text: str, response: str):
+        """Оновлює історію розмови (обрізається за бюджетом токенів режиму)."""
+        history = BaseHandler.get_history(context, key)
+        history.add_turn(user_text, response)
+        return history
+
+    @staticmethod
+    async def compact_history(history: ConversationHistory) -> None:
+        """
+        Згортає витіснені з історії повідомлення в короткий зміст.
+
+        Запускається у фоні після надсилання відповіді. Якщо запит не
+        вдався, повідомлення повертаються в чергу до наступної спроби.
+        """
+        if id(history) in BaseHandler._compacting or not history.pending:
+            return
+
+        BaseHandler._compacting.add(id(history))
+        epoch = history.epoch
+        pending = history.take_pending()
+        try:
+            summary = await summarize_conversation(
+                ResourceLoader.load_prompt("summary"), history.summary, pending
+            )
+            if history.epoch == epoch:
+                history.summary = summary
+        except Exception as e:
+            logger.error(f"Помилка згортання історії: {e}")
+            if history.epoch == epoch:
+                history.pending[:0] = pending
+        finally:
+            BaseHandler._compacting.discard(id(history))
+
 
 class RandomFactHandler(BaseHandler):
     """Обробник для випадкових фактів."""
@@ -125,47 +412,39 @@ class RandomFactHandler(BaseHandler):
         else:
             target = update.message
 
-        await BaseHandler.send_image(update, context, "random")
-        await target.reply_text(
-            "🎲 *Генерую цікавий факт...*",
-            parse_mode="Markdown"
-        )
-
-        # Отримуємо історію вже показаних фактів
-        facts_history = context.user_data.get("facts_history", [])
+        # Факти, які користувач уже бачив
+        seen = context.user_data.get("facts_seen")
+        if seen is None:
+            seen = context.user_data["facts_seen"] = BloomFilter()
 
-        # Формуємо повідомлення з історією фактів
-        history_text = ""
-        if facts_history:
-            history_text = (
-                "\n\nВАЖЛИВО: НЕ повторюй ці факти, які вже були показані:\n"
+        response = await fact_pool.take(seen)
+        if response is None:
+            # Пул недоступний — генеруємо факт напряму
+            await target.reply_text(
+                "🎲 *Генерую цікавий факт...*",
+                parse_mode="Markdown"
             )
-            for i, prev_fact in enumerate(facts_history[-10:], 1):
-                # Обмежуємо довжину для економії токенів
-                history_text += f"{i}. {prev_fact[:100]}...\n"
+            prompt = ResourceLoader.load_prompt("random")
+            try:
+                response = await generate_random_fact(prompt)
+            except Exception as e:
+                logger.error(f"Помилка GPT: {e}")
+                await target.reply_text(
+                    f"⚠️ Помилка при зверненні до ChatGPT: {e}",
+                    reply_markup=FACT_MENU.markup,
+                )
+                return MENU
+            if fact_pool.add(response):
+                seen.add(response)
 
-        prompt = ResourceLoader.load_prompt("random")
-        response = await BaseHandler.run_gpt(
-            generate_random_fact, prompt, history_text
+        reply_markup = FACT_MENU.with_button(
+            InlineKeyboardButton("📤 Поділитися", switch_inline_query=response[:100])
+        )
+        # Кожен факт — новий екран, попередні лишаються в чаті
+        await BaseHandler.show_screen(
+            update, context, "random", response, reply_markup,
+            edit=False, parse_mode=None,
         )
-
-        # Додаємо факт до історії
-        facts_history.append(response)
-        context.user_data["facts_history"] = facts_history[-20:]  # Зберігаємо останні 20 фактів
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎲 Хочу ще факт", callback_data="random"
-                ),
-                InlineKeyboardButton("📤 Поділитися", switch_inline_query=response[:100]),
-            ],
-            [
-                InlineKeyboardButton("🏠 Закінчити", callback_data="start"),
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await target.reply_text(response, reply_markup=reply_markup)
 
         return MENU
 
@@ -181,12 +460,9 @@ class GPTHandler(BaseHandler):
         query = update.callback_query
         if query:
             await query.answer()
-            await BaseHandler.send_image(update, context, "gpt")
-            text = ResourceLoader.load_message("gpt")
-            await query.message.reply_text(
-                text,
-                reply_markup=BaseHandler.create_finish_button(),
-                parse_mode="Markdown"
+            await BaseHandler.show_screen(
+                update, context, "gpt",
+                ResourceLoader.load_message("gpt"), FINISH_MENU.markup,
             )
 
         return GPT_MODE
@@ -198,28 +474,27 @@ class GPTHandler(BaseHandler):
         """Обробка повідомлення в GPT режимі."""
         user_text = update.message.text
 
-        await update.message.reply_text(
+        placeholder = await update.message.reply_text(
             "🔄 *Генерую відповідь...*", parse_mode="Markdown"
         )
 
-        history = context.user_data.get("gpt_history", [])
+        history = BaseHandler.get_history(context, "gpt_history")
         prompt = ResourceLoader.load_prompt("gpt")
-        response = await BaseHandler.run_gpt(
-            generate_gpt_response, prompt, user_text, history
+
+        response = await BaseHandler.stream_reply(
+            placeholder,
+            stream_gpt_response(
+                prompt, user_text, history.messages(), history.summary
+            ),
+            reply_markup=GPT_REPLY_MENU.markup,
         )
         BaseHandler.update_history(context, "gpt_history", user_text, response)
 
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "💬 Запитати ще", callback_data="gpt_ask_more"
-                ),
-                InlineKeyboardButton("🏠 Закінчити", callback_data="start"),
-            ]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await update.message.reply_text(response, reply_markup=reply_markup)
+        # Згортаємо витіснені повідомлення вже після відповіді користувачу
+        if history.pending:
+            context.application.create_task(
+                BaseHandler.compact_history(history)
+            )
 
         return GPT_MODE
 
@@ -232,11 +507,11 @@ class GPTHandler(BaseHandler):
         if query:
             await query.answer()
             # Очищуємо історію для нової розмови
-            context.user_data["gpt_history"] = []
+            BaseHandler.get_history(context, "gpt_history").clear()
             text = ResourceLoader.load_message("gpt")
             await query.message.reply_text(
                 text,
-                reply_markup=BaseHandler.create_finish_button(),
+                reply_markup=FINISH_MENU.markup,
                 parse_mode="Markdown"
             )
 
@@ -265,45 +540,9 @@ class TalkHandler(BaseHandler):
             return TALK_MODE
 
         await query.answer()
-        await BaseHandler.send_image(update, context, "talk")
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎸 Курт Кобейн", callback_data="talk_cobain"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "👑 Єлизавета II", callback_data="talk_queen"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "📖 Джон Толкін", callback_data="talk_tolkien"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🧠 Фрідріх Ніцше", callback_data="talk_nietzsche"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🔬 Стівен Гокінг", callback_data="talk_hawking"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        text = ResourceLoader.load_message("talk")
-        await query.message.reply_text(
-            text, reply_markup=reply_markup, parse_mode="Markdown"
+        await BaseHandler.show_screen(
+            update, context, "talk",
+            ResourceLoader.load_message("talk"), PERSONALITY_MENU.markup,
         )
 
         return TALK_MODE
@@ -328,23 +567,13 @@ class TalkHandler(BaseHandler):
             ResourceLoader.load_prompt(prompt_file)
         )
         # Очищуємо історію для нової особистості
-        context.user_data["talk_history"] = []
-
-        # Завантажуємо фото зірки
-        image_path = ResourceLoader.get_image_path(prompt_file)
-        if image_path:
-            try:
-                with open(image_path, "rb") as photo:
-                    await query.message.reply_photo(photo=photo)
-            except Exception as e:
-                logger.error(f"Помилка надсилання фото {name}: {e}", exc_info=True)
-        else:
-            logger.warning(f"Фото не знайдено: {prompt_file}")
+        BaseHandler.get_history(context, "talk_history").clear()
 
-        await query.message.reply_text(
+        # Екран з фото зірки замість списку особистостей
+        await BaseHandler.show_screen(
+            update, context, prompt_file,
             f"✅ Розмова з *{name}*!\n\n💬 Напиши своє повідомлення:",
-            reply_markup=BaseHandler.create_finish_button(),
-            parse_mode="Markdown"
+            FINISH_MENU.markup,
         )
 
         return TALK_MODE
@@ -361,22 +590,20 @@ class TalkHandler(BaseHandler):
         )
         name = context.user_data.get("personality_name", "Особистість")
 
-        await update.message.reply_text(
+        placeholder = await update.message.reply_text(
             "🔄 *Генерую відповідь...*", parse_mode="Markdown"
         )
 
-        history = context.user_data.get("talk_history", [])
-        response = await BaseHandler.run_gpt(
-            generate_talk_response, prompt, user_text, history
+        history = BaseHandler.get_history(context, "talk_history")
+        response = await BaseHandler.stream_reply(
+            placeholder,
+            stream_talk_response(prompt, user_text, history.messages()),
+            header=f"*{name}:*",
+            reply_markup=FINISH_MENU.markup,
+            finalize=limit_talk_response,
         )
         BaseHandler.update_history(context, "talk_history", user_text, response)
 
-        await update.message.reply_text(
-            f"*{name}:*\n{response}",
-            reply_markup=BaseHandler.create_finish_button(),
-            parse_mode="Markdown"
-        )
-
         return TALK_MODE
 
 
@@ -396,43 +623,9 @@ class QuizHandler(BaseHandler):
         update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
         """Показує вибір тем квізу."""
-        query = update.callback_query
-
-        await BaseHandler.send_image(update, context, "quiz")
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🌍 Географія", callback_data="quiz_geography"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🔬 Наука", callback_data="quiz_science"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🎬 Кіно", callback_data="quiz_cinema"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "⚽ Спорт", callback_data="quiz_sport"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.message.reply_text(
-            "❓ *Обери тему для квізу:*",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        await BaseHandler.show_screen(
+            update, context, "quiz",
+            "❓ *Обери тему для квізу:*", QUIZ_TOPIC_MENU.markup,
         )
 
         return QUIZ_MODE
@@ -470,26 +663,33 @@ class QuizHandler(BaseHandler):
     ):
         """Генерує нове питання квізу."""
         quiz_command = context.user_data.get("quiz_command", "quiz_biology")
-        prompt = ResourceLoader.load_prompt("quiz")
 
         questions_history = context.user_data.get(
             "quiz_questions_history", []
         )
 
-        history_text = ""
-        if questions_history:
-            history_text = (
-                "\n\nВАЖЛИВО: НЕ повторюй ці питання, "
-                "які вже були задані:\n"
-            )
-            for i, prev_question in enumerate(questions_history[-5:], 1):
-                history_text += f"{i}. {prev_question[:100]}...\n"
-
-        question_raw = await BaseHandler.run_gpt(
-            generate_quiz_question, prompt, quiz_command, history_text
-        )
+        # Беремо готове питання зі спільного пулу теми
+        item = await quiz_pool.take(quiz_command, questions_history)
+        if item:
+            question, answer = item["question"], item["answer"]
+            aliases = item.get("aliases", [])
+        else:
+            # Пул недоступний — генеруємо одне питання напряму
+            prompt = ResourceLoader.load_prompt("quiz")
+            history_text = ""
+            if questions_history:
+                history_text = (
+                    "\n\nВАЖЛИВО: НЕ повторюй ці питання, "
+                    "які вже були задані:\n"
+                )
+                for i, prev_question in enumerate(questions_history[-5:], 1):
+                    history_text += f"{i}. {prev_question[:100]}...\n"
 
-        question = extract_first_question(question_raw)
+            question_raw = await generate_quiz_question(
+                prompt, quiz_command, history_text
+            )
+            question = extract_first_question(question_raw)
+            answer, aliases = None, []
 
         questions_history.append(question)
         context.user_data["quiz_questions_history"] = (
@@ -497,6 +697,8 @@ class QuizHandler(BaseHandler):
         )
 
         context.user_data["current_question"] = question
+        context.user_data["current_answer"] = answer
+        context.user_data["current_aliases"] = aliases
         context.user_data["waiting_for_answer"] = True
 
         question_escaped = BaseHandler.escape_markdown(question)
@@ -524,28 +726,45 @@ class QuizHandler(BaseHandler):
 
         user_answer = update.message.text
         current_question = context.user_data.get("current_question", "")
-        prompt = ResourceLoader.load_prompt("quiz")
+        current_answer = context.user_data.get("current_answer")
+
+        # Спершу перевіряємо локально за правильною відповіддю та синонімами
+        is_correct = None
+        if current_answer:
+            is_correct = judge_answer(
+                user_answer,
+                current_answer,
+                context.user_data.get("current_aliases", []),
+            )
 
-        await update.message.reply_text(
-            "🔄 *Перевіряю відповідь...*", parse_mode="Markdown"
-        )
+        if is_correct is True:
+            result = "Правильно!"
+        elif is_correct is False:
+            result = f"Неправильно! Правильна відповідь - {current_answer}"
+        else:
+            # Неоднозначний випадок — питаємо ChatGPT
+            prompt = ResourceLoader.load_prompt("quiz")
 
-        result = await BaseHandler.run_gpt(
-            check_quiz_answer, prompt, current_question, user_answer
-        )
+            await update.message.reply_text(
+                "🔄 *Перевіряю відповідь...*", parse_mode="Markdown"
+            )
 
-        result_lower = result.lower().strip()
-        is_correct = False
+            result = await check_quiz_answer(
+                prompt, current_question, user_answer, current_answer
+            )
 
-        if result_lower.startswith("неправильно"):
+            result_lower = result.lower().strip()
             is_correct = False
-        elif (
-            result_lower.startswith("правильно")
-            or "правильно!" in result_lower
-        ):
-            is_correct = True
-        elif any(word in result_lower for word in ["так", "вірно", "correct"]):
-            is_correct = True
+
+            if result_lower.startswith("неправильно"):
+                is_correct = False
+            elif (
+                result_lower.startswith("правильно")
+                or "правильно!" in result_lower
+            ):
+                is_correct = True
+            elif any(word in result_lower for word in ["так", "вірно", "correct"]):
+                is_correct = True
 
         context.user_data["quiz_total"] = (
             context.user_data.get("quiz_total", 0) + 1
@@ -560,29 +779,7 @@ class QuizHandler(BaseHandler):
         total = context.user_data.get("quiz_total", 0)
         context.user_data["waiting_for_answer"] = False
 
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "➡️ Наступне питання", callback_data="quiz_next"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🔄 Почати спочатку", callback_data="quiz_restart"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🔄 Змінити тему", callback_data="quiz_change"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = QUIZ_RESULT_MENU.markup
 
         result_escaped = BaseHandler.escape_markdown(result)
 
@@ -686,47 +883,9 @@ class TranslateHandler(BaseHandler):
         update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
         """Показує вибір мови для перекладу."""
-        query = update.callback_query
-
-        await BaseHandler.send_image(update, context, "translate")
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🇬🇧 Англійська", callback_data="lang_en"
-                ),
-                InlineKeyboardButton(
-                    "🇩🇪 Німецька", callback_data="lang_de"
-                ),
-            ],
-            [
-                InlineKeyboardButton(
-                    "🇫🇷 Французька", callback_data="lang_fr"
-                ),
-                InlineKeyboardButton(
-                    "🇪🇸 Іспанська", callback_data="lang_es"
-                ),
-            ],
-            [
-                InlineKeyboardButton(
-                    "🇵🇱 Польська", callback_data="lang_pl"
-                ),
-                InlineKeyboardButton(
-                    "🇷🇺 Російська", callback_data="lang_ru"
-                ),
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.message.reply_text(
-            "🌐 *Обери мову для перекладу:*",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        await BaseHandler.show_screen(
+            update, context, "translate",
+            "🌐 *Обери мову для перекладу:*", LANGUAGE_MENU.markup,
         )
 
         return TRANSLATE_MODE
@@ -743,15 +902,12 @@ class TranslateHandler(BaseHandler):
             query.data, "обрану"
         )
         context.user_data["target_language"] = lang_name
+        # Код мови ("en", "de", ...) для локального визначення мови тексту
+        context.user_data["target_language_code"] = query.data.split("_", 1)[1]
 
-        keyboard = [
-            [InlineKeyboardButton("🔄 Змінити мову", callback_data="translate")],
-            [InlineKeyboardButton("🏠 Закінчити", callback_data="start")],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
         await query.message.reply_text(
             f"✅ Обрано: *{lang_name}*\n\n💬 Напиши текст для перекладу:",
-            reply_markup=reply_markup,
+            reply_markup=TRANSLATION_MENU.markup,
             parse_mode="Markdown"
         )
 
@@ -769,32 +925,60 @@ class TranslateHandler(BaseHandler):
         user_text = update.message.text
         lang_name = context.user_data["target_language"]
 
-        await update.message.reply_text(
+        # Текст уже цільовою мовою — перекладати нічого. Відмовляємо лише
+        # тоді, коли впевнено цією мовою написано весь текст
+        target_code = context.user_data.get("target_language_code")
+        if target_code and language_detector.is_written_in(user_text, target_code):
+            await update.message.reply_text(
+                f"ℹ️ Текст уже написано мовою «{LANGUAGE_NAMES[target_code]}» — "
+                "переклад не потрібен."
+            )
+            return TRANSLATE_MODE
+        source, _ = language_detector.detect(user_text)
+
+        placeholder = await update.message.reply_text(
             "🔄 *Перекладаю...*", parse_mode="Markdown"
         )
 
-        prompt = ResourceLoader.load_prompt("translate").format(lang_name=lang_name)
-        translation = await BaseHandler.run_gpt(translate_text, prompt, user_text)
+        # Підказка моделі: мова оригіналу, визначена локально
+        hint = f"\n\nМова оригіналу: {LANGUAGE_NAMES[source]}." if source else ""
+        prompt = ResourceLoader.format_prompt("translate", lang_name=lang_name) + hint
 
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🔄 Змінити мову", callback_data="translate"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = TRANSLATION_MENU.markup
+
+        if len(user_text) > CHUNK_CHARS:
+            # Довгий текст: частини перекладаються паралельно і
+            # показуються по порядку, кількома повідомленнями за потреби
+            await BaseHandler.stream_reply(
+                placeholder,
+                translate_long(lang_name, prompt, user_text, hint),
+                header="📝 *Переклад:*",
+                reply_markup=reply_markup,
+            )
+            return TRANSLATE_MODE
+
+        # Відомі речення беруться з пам'яті перекладів, до моделі йдуть
+        # лише нові; повністю новий текст перекладається потоково
+        translation = await translate_cached(lang_name, user_text, hint)
+        if translation is not None:
+            await BaseHandler.stream_reply(
+                placeholder,
+                BaseHandler.single_chunk(translation),
+                header="📝 *Переклад:*",
+                reply_markup=reply_markup,
+            )
+            return TRANSLATE_MODE
 
-        await update.message.reply_text(
-            f"📝 *Переклад:*\n{translation}",
+        errors = []
+        translation = await BaseHandler.stream_reply(
+            placeholder,
+            stream_translation(prompt, user_text, errors),
+            header="📝 *Переклад:*",
             reply_markup=reply_markup,
-            parse_mode="Markdown"
         )
+        # Обірваний помилкою переклад не зберігаємо
+        if not errors:
+            await remember_translation(lang_name, user_text, translation)
 
         return TRANSLATE_MODE
 
@@ -826,41 +1010,12 @@ class RecommendationsHandler(BaseHandler):
         update: Update, context: ContextTypes.DEFAULT_TYPE
     ):
         """Показує вибір категорії."""
-        query = update.callback_query
-
         if "disliked_items" not in context.user_data:
             context.user_data["disliked_items"] = []
 
-        await BaseHandler.send_image(update, context, "recommendations")
-
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "🎬 Фільми", callback_data="rec_movies"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "📚 Книги", callback_data="rec_books"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🎵 Музика", callback_data="rec_music"
-                )
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.message.reply_text(
-            "🎬 *Обери категорію:*",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+        await BaseHandler.show_screen(
+            update, context, "recommendations",
+            "🎬 *Обери категорію:*", CATEGORY_MENU.markup,
         )
 
         return RECOMMENDATIONS_MODE
@@ -878,44 +1033,17 @@ class RecommendationsHandler(BaseHandler):
         )
         context.user_data["recommendation_category"] = category
 
-        # Визначаємо жанри та емодзі залежно від категорії
-        genres = RecommendationsHandler.GENRES.get(category, MOVIE_GENRES)
+        # Сітка жанрів категорії скомпільована заздалегідь (menus.py)
         category_emoji = {"фільми": "🎬", "книги": "📚", "музику": "🎵"}.get(
             category, "🎬"
         )
+        reply_markup = GENRE_MENUS.get(category, GENRE_MENUS["фільми"]).markup
 
-        # Створюємо кнопки з жанрами (по 2 в рядку)
-        keyboard = []
-        genre_items = list(genres.items())
-        for i in range(0, len(genre_items), 2):
-            row = []
-            row.append(
-                InlineKeyboardButton(
-                    genre_items[i][1], callback_data=genre_items[i][0]
-                )
-            )
-            if i + 1 < len(genre_items):
-                row.append(
-                    InlineKeyboardButton(
-                        genre_items[i + 1][1],
-                        callback_data=genre_items[i + 1][0],
-                    )
-                )
-            keyboard.append(row)
-
-        keyboard.append(
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ]
-        )
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
-        await query.message.reply_text(
+        # Екран категорій замінюється на екран жанрів
+        await BaseHandler.show_screen(
+            update, context, "recommendations",
             f"✅ Категорія: *{category}*\n\n{category_emoji} *Обери жанр:*",
-            reply_markup=reply_markup,
-            parse_mode="Markdown"
+            reply_markup,
         )
 
         return RECOMMENDATIONS_MODE
@@ -943,102 +1071,102 @@ class RecommendationsHandler(BaseHandler):
             query.message, context, genre
         )
 
-    @staticmethod
-    async def generate_recommendation(
-        message, context: ContextTypes.DEFAULT_TYPE, genre: str
-    ):
-        """Генерує рекомендацію для обраного жанру."""
-        category = context.user_data.get("recommendation_category", "фільми")
-        disliked_items = context.user_data.get("disliked_items", [])
-
-        context.user_data["last_genre"] = genre
+    # Скільки останніх показаних творів не повторювати користувачу
+    SEEN_LIMIT = 50
 
-        await message.reply_text(
-            "🔄 *Генерую рекомендацію...*", parse_mode="Markdown"
-        )
+    @staticmethod
+    def format_recommendation(item: dict) -> str:
+        """Форматує рекомендацію з кешу для показу."""
+        lines = [f"*Назва:* {item['title']}"]
+        if item.get("description"):
+            lines.append(f"*Опис:* {item['description']}")
+        if item.get("rating"):
+            lines.append(f"*Рейтинг:* {item['rating']}")
+        return "\n".join(lines)
 
-        # Формуємо промпт
-        disliked_text = ""
-        if disliked_items:
-            disliked_text = f"\n\nНе рекомендуй: {', '.join(disliked_items)}."
+    @staticmethod
+    async def next_recommendation(
+        message, context: ContextTypes.DEFAULT_TYPE, category: str, genre: str
+    ) -> Optional[dict]:
+        """
+        Бере наступну рекомендацію з пакета сесії.
+
+        Пакет із кількох різних творів береться з кешу одним зверненням
+        і зберігається в user_data; до кешу (і до моделі) звертаємося
+        знову, лише коли пакет закінчився або змінився жанр.
+        """
+        disliked_items = context.user_data.get("disliked_items", [])
+        seen_items = context.user_data.setdefault("seen_recommendations", [])
+        disliked = {normalize_title(title) for title in disliked_items}
+
+        batch = context.user_data.get("recommendation_batch", [])
+        if context.user_data.get("recommendation_batch_key") != [category, genre]:
+            batch = []
+        while batch:
+            item = batch.pop(0)
+            if normalize_title(item["title"]) not in disliked:
+                return item
+
+        exclude = disliked_items + seen_items
+        # Небажані та вже показані твори відфільтровуються локально;
+        # модель викликається, лише якщо в кеші нічого не лишилось
+        if not recommendation_pool.available(category, genre, exclude):
+            await message.reply_text(
+                "🔄 *Генерую рекомендації...*", parse_mode="Markdown"
+            )
 
         category_singular = RecommendationsHandler.CATEGORY_SINGULAR.get(
             category, category
         )
+        batch = await recommendation_pool.take(
+            category, category_singular, genre, exclude
+        )
+        context.user_data["recommendation_batch"] = batch
+        context.user_data["recommendation_batch_key"] = [category, genre]
+        return batch.pop(0) if batch else None
 
-        # Додаємо інструкцію про рейтинг для фільмів
-        rating_instruction = ""
-        if category == "фільми":
-            rating_instruction = ResourceLoader.load_prompt("rating_instruction")
-
-        prompt = ResourceLoader.load_prompt("recommendations").format(
-            category=category,
-            category_singular=category_singular,
-            genre=genre,
-            rating_instruction=rating_instruction
-        ) + disliked_text
+    @staticmethod
+    async def generate_recommendation(
+        message, context: ContextTypes.DEFAULT_TYPE, genre: str
+    ):
+        """Показує наступну рекомендацію для обраного жанру."""
+        category = context.user_data.get("recommendation_category", "фільми")
+        context.user_data["last_genre"] = genre
 
-        recommendations = await BaseHandler.run_gpt(
-            generate_recommendation, prompt, category_singular, genre
+        item = await RecommendationsHandler.next_recommendation(
+            message, context, category, genre
         )
+        if item is None:
+            await message.reply_text(
+                "⚠️ Не вдалося згенерувати рекомендацію. Спробуй ще раз."
+            )
+            return RECOMMENDATIONS_MODE
+
+        seen_items = context.user_data.setdefault("seen_recommendations", [])
+        seen_items.append(item["title"])
+        del seen_items[:-RecommendationsHandler.SEEN_LIMIT]
 
         context.user_data["waiting_for_dislike"] = True
         context.user_data["waiting_for_dislike_input"] = False
 
-        keyboard = [
-            [
-                InlineKeyboardButton(
-                    "👎 Не подобається", callback_data="rec_dislike"
-                ),
-                InlineKeyboardButton(
-                    "📤 Поділитися", switch_inline_query=recommendations[:100]
-                ),
-            ],
-            [
-                InlineKeyboardButton(
-                    "🏠 Закінчити", callback_data="start"
-                )
-            ],
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        reply_markup = RECOMMENDATION_MENU.with_button(
+            InlineKeyboardButton(
+                "📤 Поділитися", switch_inline_query=item["title"][:100]
+            )
+        )
 
-        # Зберігаємо останню рекомендацію для автоматичного витягування назви
-        context.user_data["last_recommendation"] = recommendations
+        # Зберігаємо останню рекомендацію (з уже розібраною назвою)
+        context.user_data["last_recommendation"] = item
 
+        recommendation = RecommendationsHandler.format_recommendation(item)
         await message.reply_text(
-            f"📋 *Рекомендація ({category}):*\n\n{recommendations}",
+            f"📋 *Рекомендація ({category}):*\n\n{recommendation}",
             reply_markup=reply_markup,
             parse_mode="Markdown"
         )
 
         return RECOMMENDATIONS_MODE
 
-    @staticmethod
-    def extract_title_from_recommendation(recommendation_text: str) -> str:
-        """Витягує назву твору з тексту рекомендації."""
-        # Шукаємо рядок, що починається з "Назва:" або "Назва твору:"
-        lines = recommendation_text.split("\n")
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Назва:") or line.startswith("Назва твору:"):
-                # Витягуємо текст після "Назва:"
-                title = line.split(":", 1)[1].strip()
-                # Прибираємо можливі markdown символи
-                title = title.replace("*", "").replace("_", "").strip()
-                return title
-        
-        # Якщо не знайдено "Назва:", беремо перший рядок (зазвичай там назва)
-        if lines:
-            first_line = lines[0].strip()
-            # Прибираємо markdown та обмежуємо довжину
-            first_line = first_line.replace("*", "").replace("_", "").strip()
-            # Обмежуємо до 100 символів
-            if len(first_line) > 100:
-                first_line = first_line[:100].rsplit(" ", 1)[0]
-            return first_line
-        
-        return "Невідомий твір"
-
     @staticmethod
     @answer_callback_query
     async def handle_dislike_button(
@@ -1051,17 +1179,14 @@ class RecommendationsHandler(BaseHandler):
             await query.message.reply_text("Спочатку отримай рекомендації")
             return RECOMMENDATIONS_MODE
 
-        # Автоматично витягуємо назву з останньої рекомендації
-        last_recommendation = context.user_data.get("last_recommendation", "")
-        if not last_recommendation:
+        last_recommendation = context.user_data.get("last_recommendation")
+        if not isinstance(last_recommendation, dict):
             await query.message.reply_text(
                 "Не вдалося знайти останню рекомендацію"
             )
             return RECOMMENDATIONS_MODE
 
-        disliked_item = RecommendationsHandler.extract_title_from_recommendation(
-            last_recommendation
-        )
+        disliked_item = last_recommendation["title"]
         disliked_items = context.user_data.get("disliked_items", [])
 
         if disliked_item not in disliked_items:
@@ -1071,17 +1196,14 @@ class RecommendationsHandler(BaseHandler):
         context.user_data["waiting_for_dislike"] = False
         context.user_data["waiting_for_dislike_input"] = False
 
-        category = context.user_data.get("recommendation_category", "фільми")
         genre = context.user_data.get("last_genre", "загальний")
 
         await query.message.reply_text(
-            f"✅ Додано до списку небажаних: *{disliked_item}*\n\n"
-            "🔄 *Генерую нову рекомендацію...*",
+            f"✅ Додано до списку небажаних: *{disliked_item}*",
             parse_mode="Markdown"
         )
 
-        # Генеруємо нову рекомендацію
+        # Видаємо нову рекомендацію
         return await RecommendationsHandler.generate_recommendation(
             query.message, context, genre
         )
-
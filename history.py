@@ -0,0 +1,180 @@
+"""Історія розмов з обмеженням за кількістю токенів."""
+import logging
+from collections import deque
+from typing import List, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Службові токени, які API додає до кожного повідомлення
+MESSAGE_OVERHEAD = 4
+
+# Калібрування оцінювача для токенізатора o200k (gpt-4o-mini):
+# латиниця ~4 символи на токен, кирилиця та інші системи письма ~2.5
+LATIN_CHARS_PER_TOKEN = 4.0
+OTHER_CHARS_PER_TOKEN = 2.5
+
+# Токенізатор завантажується при старті (load_encoder у пулі потоків):
+# на новому хості tiktoken завантажує файл BPE з мережі, і синхронне
+# завантаження при першому запиті зупинило б цикл подій для всіх чатів
+_encoder = None
+
+
+def load_encoder() -> bool:
+    """
+    Завантажує токенізатор tiktoken (блокуючий виклик).
+
+    Returns:
+        True, якщо токенізатор доступний; інакше використовується оцінка
+    """
+    global _encoder
+    if _encoder is None and tiktoken is not None:
+        try:
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            logger.warning(f"tiktoken недоступний, використовую оцінку: {e}")
+    return _encoder is not None
+
+
+def estimate_tokens(text: str) -> int:
+    """Оцінює кількість токенів без токенізатора."""
+    latin = sum(1 for char in text if char < "ɐ")
+    other = len(text) - latin
+    return int(latin / LATIN_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def count_tokens(text: str) -> int:
+    """Рахує токени тексту (tiktoken, якщо вже завантажений, або оцінка)."""
+    if _encoder is not None:
+        return len(_encoder.encode(text))
+    return estimate_tokens(text)
+
+
+class ConversationHistory:
+    """
+    Історія діалогу, обмежена бюджетом токенів.
+
+    Повідомлення зберігаються в deque (кільцевий буфер): додавання та
+    витіснення найстаріших пар — O(1), без копіювання списку. Якщо
+    увімкнено summarize, витіснені повідомлення накопичуються в pending,
+    щоб фонове завдання згорнуло їх у summary.
+    """
+
+    __slots__ = (
+        "budget", "summarize", "summary", "pending", "epoch",
+        "_messages", "_tokens", "_total",
+    )
+
+    def __init__(self, budget: int, summarize: bool = False):
+        """Створює порожню історію з бюджетом budget токенів."""
+        self.budget = budget
+        self.summarize = summarize
+        self.summary = ""
+        self.pending = []
+        self.epoch = 0
+        self._messages = deque()
+        self._tokens = deque()
+        self._total = 0
+
+    def __len__(self) -> int:
+        """Кількість повідомлень в історії."""
+        return len(self._messages)
+
+    @property
+    def tokens(self) -> int:
+        """Поточний розмір історії в токенах."""
+        return self._total
+
+    def messages(self) -> List[dict]:
+        """Повертає повідомлення у форматі Chat Completions API."""
+        return list(self._messages)
+
+    def add_turn(self, user_text: str, response: str) -> List[dict]:
+        """
+        Додає пару повідомлень і витісняє найстаріші пари понад бюджет.
+
+        Returns:
+            Витіснені повідомлення (від найстарішого)
+        """
+        self._append("user", user_text)
+        self._append("assistant", response)
+        evicted = self.trim()
+        if self.summarize:
+            self.pending.extend(evicted)
+        return evicted
+
+    def take_pending(self) -> List[dict]:
+        """Забирає повідомлення, що очікують згортання в summary."""
+        pending, self.pending = self.pending, []
+        return pending
+
+    def trim(self, budget: Optional[int] = None) -> List[dict]:
+        """
+        Витісняє найстаріші пари, доки історія не вкладеться в бюджет.
+
+        Остання пара не витісняється ніколи: якщо вона одна більша за
+        бюджет, її повідомлення вкорочуються.
+        """
+        budget = self.budget if budget is None else budget
+        evicted = []
+        while self._total > budget and len(self._messages) > 2:
+            # Витісняємо парою, щоб історія завжди починалась з user
+            for _ in range(2):
+                evicted.append(self._messages.popleft())
+                self._total -= self._tokens.popleft()
+        if self._total > budget:
+            self._shorten(budget)
+        return evicted
+
+    def _shorten(self, budget: int) -> None:
+        """
+        Вкорочує повідомлення (спершу найдовші), щоб вкластися в бюджет.
+
+        Кожне повідомлення зберігає щонайменше рівну частку бюджету, тож
+        довга відповідь не витісняє питання повністю.
+        """
+        share = budget // len(self._messages)
+        order = sorted(
+            range(len(self._messages)), key=self._tokens.__getitem__, reverse=True
+        )
+        for index in order:
+            excess = self._total - budget
+            if excess <= 0:
+                break
+            message = self._messages[index]
+            tokens = self._tokens[index]
+            # Один токен — запас на "…" та округлення оцінки
+            target = max(tokens - excess, share) - MESSAGE_OVERHEAD - 1
+            content_tokens = tokens - MESSAGE_OVERHEAD
+            if content_tokens <= max(target, 0):
+                continue
+            # Довжину в символах зменшуємо пропорційно зайвим токенам
+            keep = max(target, 0) / content_tokens
+            content = message["content"][:int(len(message["content"]) * keep)]
+            if content:
+                content = content.rstrip() + "…"
+            shortened = count_tokens(content) + MESSAGE_OVERHEAD
+            self._messages[index] = {"role": message["role"], "content": content}
+            self._tokens[index] = shortened
+            self._total += shortened - tokens
+
+    def clear(self) -> None:
+        """Очищує історію разом із summary."""
+        self._messages.clear()
+        self._tokens.clear()
+        self._total = 0
+        self.summary = ""
+        self.pending = []
+        # Незавершене фонове згортання не повинно записати старий summary
+        self.epoch += 1
+
+    def _append(self, role: str, content: str) -> None:
+        """Додає повідомлення та рахує його токени (один раз)."""
+        tokens = count_tokens(content) + MESSAGE_OVERHEAD
+        self._messages.append({"role": role, "content": content})
+        self._tokens.append(tokens)
+        self._total += tokens
@@ -0,0 +1,228 @@
+"""
+Оптимізація зображень з resources/images для надсилання в Telegram.
+
+При старті кожне зображення перекодовується (Pillow, опціональна
+залежність): зменшується до роздільності, яку Telegram однаково
+використовує для фото, стискається в JPEG з заданою якістю, а метадані
+(EXIF, XMP, ICC, коментарі) відкидаються. Результат кешується на диску в
+.cache/images/ за SHA-256 вихідного файлу і параметрами кодування, тож
+при перезапуску перекодовуються лише змінені зображення. Байти
+тримаються в пам'яті — надсилання не відкриває файли.
+
+Pillow — у requirements.txt; якщо його все ж немає, при старті в лог
+пишеться попередження, а надсилаються вихідні файли (також з пам'яті).
+
+Офлайн-бенчмарк розміру (і, з --upload, часу завантаження в Telegram):
+    python images.py [--upload]
+"""
+import io
+import os
+import sys
+import glob
+import time
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+from utils import ResourceLoader, ImageCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+
+class ImageStore:
+    """Оптимізовані зображення в пам'яті з дисковим кешем."""
+
+    CACHE_DIR = ".cache/images"
+    # Telegram зберігає фото з довшою стороною до 1280 px
+    MAX_SIDE = 1280
+    QUALITY = 82
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        """Створює порожнє сховище з дисковим кешем у cache_dir."""
+        self.cache_dir = cache_dir
+        self._images: Dict[str, Tuple[str, bytes]] = {}  # name -> (hash, байти)
+
+    def _cache_path(self, source_hash: str) -> str:
+        """Файл кешу для вихідного хешу та поточних параметрів кодування."""
+        return os.path.join(
+            self.cache_dir, f"{source_hash}-{self.MAX_SIDE}-q{self.QUALITY}.jpg"
+        )
+
+    @classmethod
+    def encode(cls, data: bytes) -> bytes:
+        """Перекодовує JPEG: зменшення, стиснення, без метаданих."""
+        with Image.open(io.BytesIO(data)) as image:
+            # Орієнтацію з EXIF застосовуємо до пікселів, бо EXIF відкидається
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            image.thumbnail((cls.MAX_SIDE, cls.MAX_SIDE), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(
+                output,
+                format="JPEG",
+                quality=cls.QUALITY,
+                optimize=True,
+                progressive=True,
+            )
+        return output.getvalue()
+
+    def optimize(self, path: str, source_hash: str) -> bytes:
+        """Повертає оптимізовані байти зображення (з кешу або кодуючи)."""
+        cache_path = self._cache_path(source_hash)
+        if Image is not None:
+            try:
+                with open(cache_path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                pass
+
+        with open(path, "rb") as f:
+            original = f.read()
+        if Image is None:
+            return original
+
+        try:
+            optimized = self.encode(original)
+        except Exception as e:
+            logger.error(f"Не вдалося оптимізувати {path}: {e}")
+            return original
+        # Вже оптимальний файл лишаємо як є
+        if len(optimized) >= len(original):
+            optimized = original
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(optimized)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Не вдалося зберегти {cache_path}: {e}")
+        return optimized
+
+    def _load(self, name: str, path: str) -> bytes:
+        """Завантажує (оптимізує) зображення в пам'ять."""
+        source_hash = ImageCache.file_hash(path)
+        data = self.optimize(path, source_hash)
+        self._images[name] = (source_hash, data)
+        return data
+
+    def preload(self) -> int:
+        """
+        Оптимізує всі зображення та тримає їх у пам'яті.
+
+        Returns:
+            Кількість зображень
+        """
+        if Image is None:
+            logger.warning(
+                "Pillow не встановлено (pip install -r requirements.txt): "
+                "зображення надсилаються без оптимізації"
+            )
+        original = optimized = 0
+        pattern = os.path.join(ResourceLoader.IMAGES_DIR, "*.jpg")
+        for path in sorted(glob.glob(pattern)):
+            name = os.path.splitext(os.path.basename(path))[0]
+            optimized += len(self._load(name, path))
+            original += os.path.getsize(path)
+        if original:
+            logger.info(
+                f"Зображення: {len(self._images)}, "
+                f"{original // 1024} КБ -> {optimized // 1024} КБ"
+            )
+        return len(self._images)
+
+    def get(self, name: str, path: str) -> bytes:
+        """
+        Повертає байти зображення з пам'яті.
+
+        Змінений на диску файл (інший SHA-256) оптимізується заново.
+        """
+        entry = self._images.get(name)
+        if entry is not None and entry[0] == ImageCache.file_hash(path):
+            return entry[1]
+        return self._load(name, path)
+
+
+image_store = ImageStore()
+
+
+async def _upload_time(bot, chat_id: int, name: str, data: bytes) -> float:
+    """Час надсилання фото в службовий чат (повідомлення видаляється)."""
+    started = time.perf_counter()
+    message = await bot.send_photo(
+        chat_id=chat_id,
+        photo=data,
+        filename=f"{name}.jpg",
+        disable_notification=True,
+    )
+    elapsed = time.perf_counter() - started
+    await bot.delete_message(chat_id=chat_id, message_id=message.message_id)
+    return elapsed
+
+
+async def _measure_uploads(samples) -> Tuple[float, float]:
+    """Сумарний час завантаження вихідних та оптимізованих зображень."""
+    from telegram import Bot
+    from credentials import BOT_TOKEN, IMAGE_CACHE_CHAT_ID
+
+    original = optimized = 0.0
+    async with Bot(BOT_TOKEN) as bot:
+        for name, source, result in samples:
+            original += await _upload_time(bot, IMAGE_CACHE_CHAT_ID, name, source)
+            optimized += await _upload_time(bot, IMAGE_CACHE_CHAT_ID, name, result)
+    return original, optimized
+
+
+def _benchmark(upload: bool = False) -> None:
+    """Офлайн-бенчмарк: економія байтів, час кодування та (опційно) завантаження."""
+    if Image is None:
+        print("Pillow не встановлено: pip install Pillow")
+        return
+
+    samples = []
+    encode_time = 0.0
+    pattern = os.path.join(ResourceLoader.IMAGES_DIR, "*.jpg")
+    for path in sorted(glob.glob(pattern)):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "rb") as f:
+            source = f.read()
+        started = time.perf_counter()
+        result = ImageStore.encode(source)
+        encode_time += time.perf_counter() - started
+        if len(result) >= len(source):
+            result = source
+        samples.append((name, source, result))
+        print(
+            f"  {name:<16} {len(source) / 1024:7.1f} КБ -> "
+            f"{len(result) / 1024:7.1f} КБ ({1 - len(result) / len(source):.0%})"
+        )
+
+    original = sum(len(source) for _, source, _ in samples)
+    optimized = sum(len(result) for _, _, result in samples)
+    print(
+        f"Разом: {original / 1024:.1f} КБ -> {optimized / 1024:.1f} КБ, "
+        f"заощаджено {(original - optimized) / 1024:.1f} КБ "
+        f"({1 - optimized / original:.0%})"
+    )
+    print(f"Кодування: {encode_time * 1000:.0f} мс на {len(samples)} зображень")
+
+    if upload:
+        original_time, optimized_time = asyncio.run(_measure_uploads(samples))
+        print(
+            f"Завантаження в Telegram: {original_time:.2f} с -> "
+            f"{optimized_time:.2f} с ({optimized_time - original_time:+.2f} с)"
+        )
+    else:
+        print("Час завантаження в Telegram: python images.py --upload "
+              "(потрібні BOT_TOKEN та IMAGE_CACHE_CHAT_ID)")
+
+
+if __name__ == "__main__":
+    _benchmark(upload="--upload" in sys.argv[1:])
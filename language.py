@@ -0,0 +1,279 @@
+"""
+Локальне визначення мови тексту за символьними n-грамами.
+
+Модель — наївний баєсів класифікатор на частотах 1-3-грам символів,
+навчений на коротких зразках текстів (resources/languages/<код>.txt)
+при старті бота. Спочатку за літерами визначається письмо (кирилиця чи
+латиниця), потім серед мов цього письма обирається та, для якої сума
+логарифмів ймовірностей n-грам тексту найбільша.
+
+Класифікатор завжди обирає одну з відомих мов, тож для споріднених мов,
+які бот не підтримує (італійська, португальська, болгарська, ...), є
+зразки в resources/languages/other/: перемога такої мови означає «мова
+невідома». Додатково рішення відкидається, якщо надто мало n-грам тексту
+трапляється у профілі мови-переможця.
+
+Офлайн-бенчмарк точності та швидкості:
+    python language.py
+"""
+import os
+import glob
+import math
+import time
+import logging
+from collections import Counter
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Назви мов (для підказки моделі та повідомлень користувачу)
+LANGUAGE_NAMES = {
+    "en": "англійська",
+    "de": "німецька",
+    "fr": "французька",
+    "es": "іспанська",
+    "pl": "польська",
+    "ru": "російська",
+    "uk": "українська",
+}
+
+# Мови на кирилиці (решта — на латиниці), включно з мовами-відмовами
+CYRILLIC_LANGUAGES = {"ru", "uk", "bg", "be", "sr"}
+
+
+class LanguageDetector:
+    """Класифікатор мови за символьними n-грамами."""
+
+    LANGUAGES_DIR = "resources/languages"
+    # Зразки мов, які бот не підтримує (результат — None)
+    OTHER_DIR = "other"
+    NGRAM_SIZES = (1, 2, 3)
+    # Скільки найчастіших n-грам кожної мови входить у модель
+    PROFILE_SIZE = 400
+    # Згладжування Лапласа для частот n-грам
+    ALPHA = 0.5
+    # Довші тексти класифікуються за початком
+    MAX_CHARS = 200
+    # Мінімум відомих n-грам для впевненого рішення
+    MIN_NGRAMS = 8
+    # Мінімальна перевага найкращої мови (лог-ймовірність на n-граму)
+    MIN_MARGIN = 0.1
+    # Мінімальна частка n-грам тексту з профілю мови-переможця
+    MIN_COVERAGE = 0.6
+    # Скільки фрагментів по MAX_CHARS перевіряє is_written_in()
+    MAX_SAMPLES = 5
+
+    def __init__(self, directory: str = LANGUAGES_DIR):
+        """Створює порожній детектор зі зразками текстів у directory."""
+        self.directory = directory
+        self.codes: Tuple[str, ...] = ()
+        # Мови, які можна повернути (решта кодів — мови-відмови)
+        self.supported: frozenset = frozenset()
+        self._profiles: Tuple[frozenset, ...] = ()
+        # Для кожної мови: n-грама -> логарифм її ймовірності
+        self._tables: Tuple[Dict[str, float], ...] = ()
+        self._vocabulary: frozenset = frozenset()
+
+    @staticmethod
+    def ngrams(text: str, limit: int = None) -> Iterator[str]:
+        """Нормалізує текст і повертає його символьні n-грами."""
+        words = "".join(
+            char if char.isalpha() or char == "'" else " "
+            for char in text[:limit].lower()
+        ).split()
+        for word in words:
+            padded = f" {word} "
+            for size in LanguageDetector.NGRAM_SIZES:
+                for index in range(len(padded) - size + 1):
+                    yield padded[index:index + size]
+
+    def load(self) -> int:
+        """Навчає модель на зразках текстів; повертає кількість мов."""
+        corpora = self._read_corpora(self.directory)
+        other = self._read_corpora(os.path.join(self.directory, self.OTHER_DIR))
+        self.train(corpora, other)
+        logger.info(
+            f"Детектор мов: {len(self.supported)} мов "
+            f"(+{len(other)} мов-відмов), {len(self._vocabulary)} n-грам"
+        )
+        return len(self.supported)
+
+    @staticmethod
+    def _read_corpora(directory: str) -> Dict[str, str]:
+        """Читає зразки текстів {код: текст} з directory/<код>.txt."""
+        corpora = {}
+        for path in sorted(glob.glob(os.path.join(directory, "*.txt"))):
+            code = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "r", encoding="utf-8") as f:
+                corpora[code] = f.read()
+        return corpora
+
+    def train(
+        self, corpora: Dict[str, str], other: Dict[str, str] = None
+    ) -> None:
+        """
+        Будує таблицю ваг n-грам за зразками текстів {код: текст}.
+
+        other — зразки мов-відмов: вони беруть участь у класифікації,
+        але detect() замість них повертає None.
+        """
+        profiles = {
+            code: dict(Counter(self.ngrams(text)).most_common(self.PROFILE_SIZE))
+            for code, text in {**(other or {}), **corpora}.items()
+        }
+        vocabulary = frozenset().union(*profiles.values())
+        self.codes = tuple(sorted(profiles))
+        self.supported = frozenset(corpora)
+        self._profiles = tuple(frozenset(profiles[code]) for code in self.codes)
+        self._vocabulary = vocabulary
+        self._tables = tuple(
+            self._log_probabilities(profiles[code], vocabulary)
+            for code in self.codes
+        )
+
+    def _log_probabilities(self, profile: dict, vocabulary: frozenset) -> dict:
+        """Згладжені логарифми ймовірностей n-грам однієї мови."""
+        denominator = sum(profile.values()) + self.ALPHA * len(vocabulary)
+        return {
+            ngram: math.log((profile.get(ngram, 0) + self.ALPHA) / denominator)
+            for ngram in vocabulary
+        }
+
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Визначає мову тексту.
+
+        Довші за MAX_CHARS тексти класифікуються за початком.
+
+        Returns:
+            (код мови або None, якщо мова невідома чи не впевнені;
+            перевага над другою мовою)
+        """
+        if not self.codes:
+            self.load()
+
+        sample = text[:self.MAX_CHARS]
+        all_grams = list(self.ngrams(sample))
+        grams = [ngram for ngram in all_grams if ngram in self._vocabulary]
+        if len(grams) < self.MIN_NGRAMS:
+            return None, 0.0
+
+        # Письмо визначаємо напряму: кирилиця і латиниця не змішуються
+        lowered = sample.lower()
+        cyrillic = sum(1 for char in lowered if "а" <= char <= "ґ")
+        latin = sum(1 for char in lowered if "a" <= char <= "z")
+        is_cyrillic = cyrillic > latin
+
+        ranked = sorted(
+            (
+                (sum(map(table.__getitem__, grams)), code, profile)
+                for code, table, profile in zip(
+                    self.codes, self._tables, self._profiles
+                )
+                if (code in CYRILLIC_LANGUAGES) == is_cyrillic
+            ),
+            key=lambda entry: entry[0],
+            reverse=True,
+        )
+        if not ranked:
+            return None, 0.0
+        _, best, profile = ranked[0]
+        margin = (
+            (ranked[0][0] - ranked[1][0]) / len(grams)
+            if len(ranked) > 1 else math.inf
+        )
+        if best not in self.supported or margin < self.MIN_MARGIN:
+            return None, margin
+
+        # Абсолютна перевірка: текст мовою, якої модель не знає, теж
+        # має переможця, але мало спільних з ним n-грам
+        coverage = sum(1 for ngram in all_grams if ngram in profile) / len(all_grams)
+        if coverage < self.MIN_COVERAGE:
+            return None, margin
+        return best, margin
+
+    def is_written_in(self, text: str, code: str) -> bool:
+        """
+        Чи впевнено весь текст написано мовою code.
+
+        Перевіряються до MAX_SAMPLES фрагментів, рівномірно розподілених
+        по тексту, — текст, який лише починається мовою code, не проходить.
+        """
+        count = min(self.MAX_SAMPLES, max(1, math.ceil(len(text) / self.MAX_CHARS)))
+        step = max(len(text) - self.MAX_CHARS, 0) / max(count - 1, 1)
+        for index in range(count):
+            start = int(index * step)
+            # Фрагмент починаємо з межі слова
+            if start:
+                start = text.find(" ", start) + 1 or start
+            if self.detect(text[start:start + self.MAX_CHARS])[0] != code:
+                return False
+        return True
+
+
+language_detector = LanguageDetector()
+
+
+def _benchmark(path: str = "resources/languages/benchmark.tsv") -> None:
+    """Офлайн-бенчмарк: точність на відкладених реченнях та швидкість."""
+    detector = LanguageDetector()
+    started = time.perf_counter()
+    detector.load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    with open(path, "r", encoding="utf-8") as f:
+        samples = [line.rstrip("\n").split("\t", 1) for line in f if "\t" in line]
+
+    # Мови поза моделлю (зразки інших мов) мають давати None
+    known = [(code, text) for code, text in samples if code in detector.supported]
+    unknown = [(code, text) for code, text in samples if code not in detector.supported]
+
+    correct = undecided = 0
+    for expected, text in known:
+        detected, margin = detector.detect(text)
+        if detected == expected:
+            correct += 1
+        elif detected is None:
+            undecided += 1
+            print(f"  ?  {expected}: {text} (перевага {margin:.3f})")
+        else:
+            print(f"  ✗  {expected} → {detected}: {text}")
+
+    rejected = 0
+    for language, text in unknown:
+        detected, margin = detector.detect(text)
+        if detected is None:
+            rejected += 1
+        else:
+            print(f"  ✗  {language} → {detected}: {text} (перевага {margin:.3f})")
+
+    rounds = 200
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for _, text in samples:
+            detector.detect(text)
+    elapsed = time.perf_counter() - started
+    calls = rounds * len(samples)
+
+    print(
+        f"Мов: {len(detector.supported)} (+{len(detector.codes) - len(detector.supported)} "
+        f"мов-відмов), n-грам у моделі: {len(detector._vocabulary)}"
+    )
+    print(f"Навчання: {load_ms:.1f} мс")
+    print(
+        f"Точність: {correct}/{len(known)} ({correct / len(known):.1%}), "
+        f"без рішення: {undecided}"
+    )
+    if unknown:
+        print(
+            f"Відхилено текстів іншими мовами: {rejected}/{len(unknown)} "
+            f"({rejected / len(unknown):.1%})"
+        )
+    print(
+        f"Швидкість: {calls / elapsed:,.0f} текстів/с, "
+        f"{elapsed / calls * 1e6:.0f} мкс на текст"
+    )
+
+
+if __name__ == "__main__":
+    _benchmark()
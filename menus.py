@@ -0,0 +1,228 @@
+"""
+Декларативний реєстр меню, кнопок та callback id.
+
+Меню описуються даними (рядки кнопок «текст — callback_data») і
+компілюються в InlineKeyboardMarkup один раз при імпорті. Об'єкти
+клавіатур незмінні (TelegramObject у PTB v20+ заморожені), тож обробники
+надсилають ті самі екземпляри замість того, щоб будувати їх на кожне
+оновлення.
+
+Маршрутизація callback-запитів — CallbackRouter: один словник
+callback_data -> обробник на стан розмови замість переліку
+CallbackQueryHandler з регулярними виразами, які перевіряються по черзі.
+"""
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Mapping, Sequence, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+from genres import MOVIE_GENRES, BOOK_GENRES, MUSIC_GENRES
+
+# Callback id, спільні для кількох меню
+START = "start"
+RANDOM = "random"
+GPT = "gpt"
+TALK = "talk"
+QUIZ = "quiz"
+TRANSLATE = "translate"
+RECOMMENDATIONS = "recommendations"
+GPT_ASK_MORE = "gpt_ask_more"
+QUIZ_NEXT = "quiz_next"
+QUIZ_RESTART = "quiz_restart"
+QUIZ_CHANGE = "quiz_change"
+REC_DISLIKE = "rec_dislike"
+
+FINISH_BUTTON = ("🏠 Закінчити", START)
+
+Row = Sequence[Tuple[str, str]]
+
+
+class Menu:
+    """Меню: рядки кнопок (текст, callback_data), скомпільовані один раз."""
+
+    __slots__ = ("name", "rows", "markup", "callbacks")
+
+    def __init__(self, name: str, rows: Iterable[Row], finish: bool = True):
+        """Компілює клавіатуру; finish додає рядок з кнопкою 'Закінчити'."""
+        rows = [tuple(row) for row in rows]
+        if finish:
+            rows.append((FINISH_BUTTON,))
+        self.name = name
+        self.rows = tuple(rows)
+        self.markup = InlineKeyboardMarkup(
+            tuple(
+                tuple(
+                    InlineKeyboardButton(text, callback_data=data)
+                    for text, data in row
+                )
+                for row in self.rows
+            )
+        )
+        # Власні callback id меню (без спільної кнопки 'Закінчити')
+        self.callbacks = frozenset(
+            data for row in self.rows for _, data in row if data != START
+        )
+
+    def with_button(self, button: InlineKeyboardButton) -> InlineKeyboardMarkup:
+        """
+        Клавіатура меню з додатковою кнопкою в першому рядку.
+
+        Для кнопок з даними відповіді (наприклад, 'Поділитися' з текстом
+        факту); решта кнопок — ті самі скомпільовані об'єкти.
+        """
+        rows = self.markup.inline_keyboard
+        return InlineKeyboardMarkup(((*rows[0], button), *rows[1:]))
+
+
+def grid(options: Mapping[str, str], columns: int = 2) -> list:
+    """Розкладає варіанти {callback_data: текст} по рядках з columns кнопок."""
+    items = [(text, data) for data, text in options.items()]
+    return [items[i:i + columns] for i in range(0, len(items), columns)]
+
+
+# --- Меню бота ---
+
+MAIN_MENU = Menu(
+    "main",
+    [
+        [("🎲 Цікавий факт", RANDOM), ("🤖 Чат GPT", GPT)],
+        [("👤 Чат із зіркою", TALK), ("❓ Квіз", QUIZ)],
+        [("🌐 Перекладач", TRANSLATE), ("🎬 Рекомендації", RECOMMENDATIONS)],
+    ],
+    finish=False,
+)
+
+FINISH_MENU = Menu("finish", [])
+
+FACT_MENU = Menu("fact", [[("🎲 Хочу ще факт", RANDOM)]])
+
+GPT_REPLY_MENU = Menu(
+    "gpt_reply", [[("💬 Запитати ще", GPT_ASK_MORE), FINISH_BUTTON]], finish=False
+)
+
+PERSONALITY_MENU = Menu(
+    "personalities",
+    [
+        [("🎸 Курт Кобейн", "talk_cobain")],
+        [("👑 Єлизавета II", "talk_queen")],
+        [("📖 Джон Толкін", "talk_tolkien")],
+        [("🧠 Фрідріх Ніцше", "talk_nietzsche")],
+        [("🔬 Стівен Гокінг", "talk_hawking")],
+    ],
+)
+
+QUIZ_TOPIC_MENU = Menu(
+    "quiz_topics",
+    [
+        [("🌍 Географія", "quiz_geography")],
+        [("🔬 Наука", "quiz_science")],
+        [("🎬 Кіно", "quiz_cinema")],
+        [("⚽ Спорт", "quiz_sport")],
+    ],
+)
+
+QUIZ_RESULT_MENU = Menu(
+    "quiz_result",
+    [
+        [("➡️ Наступне питання", QUIZ_NEXT)],
+        [("🔄 Почати спочатку", QUIZ_RESTART)],
+        [("🔄 Змінити тему", QUIZ_CHANGE)],
+    ],
+)
+
+LANGUAGE_MENU = Menu(
+    "languages",
+    [
+        [("🇬🇧 Англійська", "lang_en"), ("🇩🇪 Німецька", "lang_de")],
+        [("🇫🇷 Французька", "lang_fr"), ("🇪🇸 Іспанська", "lang_es")],
+        [("🇵🇱 Польська", "lang_pl"), ("🇷🇺 Російська", "lang_ru")],
+    ],
+)
+
+TRANSLATION_MENU = Menu("translation", [[("🔄 Змінити мову", TRANSLATE)]])
+
+CATEGORY_MENU = Menu(
+    "categories",
+    [
+        [("🎬 Фільми", "rec_movies")],
+        [("📚 Книги", "rec_books")],
+        [("🎵 Музика", "rec_music")],
+    ],
+)
+
+# Сітки жанрів по 2 кнопки в рядку (ключ — категорія рекомендацій)
+GENRE_MENUS = MappingProxyType({
+    "фільми": Menu("genres_movies", grid(MOVIE_GENRES)),
+    "книги": Menu("genres_books", grid(BOOK_GENRES)),
+    "музику": Menu("genres_music", grid(MUSIC_GENRES)),
+})
+
+RECOMMENDATION_MENU = Menu(
+    "recommendation", [[("👎 Не подобається", REC_DISLIKE)]]
+)
+
+MENUS = MappingProxyType({
+    menu.name: menu
+    for menu in (
+        MAIN_MENU,
+        FINISH_MENU,
+        FACT_MENU,
+        GPT_REPLY_MENU,
+        PERSONALITY_MENU,
+        QUIZ_TOPIC_MENU,
+        QUIZ_RESULT_MENU,
+        LANGUAGE_MENU,
+        TRANSLATION_MENU,
+        CATEGORY_MENU,
+        *GENRE_MENUS.values(),
+        RECOMMENDATION_MENU,
+    )
+})
+
+
+# --- Маршрутизація callback-запитів ---
+
+Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], object]
+
+
+def routes(menu: Menu, callback: Callback) -> Dict[str, Callback]:
+    """Маршрути всіх власних кнопок меню до одного обробника."""
+    return dict.fromkeys(menu.callbacks, callback)
+
+
+class CallbackRouter:
+    """
+    Диспетчер callback-запитів одного стану розмови.
+
+    Обробник шукається за callback_data в незмінному словнику (O(1)),
+    тож на стан реєструється один CallbackQueryHandler.
+    """
+
+    __slots__ = ("routes",)
+
+    def __init__(self, *tables: Mapping[str, Callback]):
+        """Об'єднує таблиці маршрутів (пізніші перекривають попередні)."""
+        merged = {}
+        for table in tables:
+            merged.update(table)
+        self.routes = MappingProxyType(merged)
+
+    def matches(self, data: object) -> bool:
+        """Чи є маршрут для callback_data (pattern для CallbackQueryHandler)."""
+        return isinstance(data, str) and data in self.routes
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Викликає обробник кнопки і повертає новий стан розмови."""
+        return await self.routes[update.callback_query.data](update, context)
+
+    def handler(self) -> CallbackQueryHandler:
+        """CallbackQueryHandler для реєстрації в стані розмови."""
+        return CallbackQueryHandler(self.dispatch, pattern=self.matches)
+
+
+def unrouted(routers: Iterable[CallbackRouter]) -> set:
+    """Callback id кнопок меню, для яких немає маршруту в жодному стані."""
+    routed = set().union(*(router.routes for router in routers))
+    buttons = set().union(*(menu.callbacks for menu in MENUS.values()))
+    return buttons - routed
@@ -0,0 +1,252 @@
+"""Збереження даних користувачів та станів розмов у SQLite."""
+import json
+import pickle
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Персистентність на SQLite (WAL) з відкладеним пакетним записом.
+
+    - user_data завантажується ліниво: при першому оновленні від
+      користувача (refresh_user_data), а не весь одразу при старті;
+    - зміни лише фіксуються в пам'яті, а запис виконується пакетами
+      в окремому потоці, тож обробка оновлень не чекає на диск;
+    - Application викликає оновлення раз на update_interval секунд
+      та при зупинці (flush), тому нічого не губиться при деплої.
+
+    chat_data, bot_data та callback_data бот не використовує і не зберігає.
+    """
+
+    def __init__(self, path: str = "bot_data.sqlite3", update_interval: float = 5):
+        """Створює персистентність з файлом бази path."""
+        super().__init__(
+            store_data=PersistenceInput(
+                bot_data=False, chat_data=False, callback_data=False
+            ),
+            update_interval=update_interval,
+        )
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        self._loaded = set()  # user_id, дані яких уже підвантажені
+        self._loading = {}  # user_id -> asyncio.Task
+        self._dirty_users = {}  # user_id -> pickle або None (видалення)
+        self._dirty_conversations = {}  # (name, key) -> pickle або None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    # --- Робота з базою (виконується в пулі потоків) ---
+
+    def _connection(self) -> sqlite3.Connection:
+        """Відкриває з'єднання та створює таблиці (один раз)."""
+        if self._conn is None:
+            # timeout: базу можуть одночасно писати кілька воркерів (sharding.py)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS user_data ("
+                "user_id INTEGER PRIMARY KEY, data BLOB NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "name TEXT NOT NULL, key TEXT NOT NULL, state BLOB NOT NULL, "
+                "PRIMARY KEY (name, key))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _read_user(self, user_id: int) -> Optional[dict]:
+        """Читає user_data одного користувача."""
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT data FROM user_data WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _read_conversations(self, name: str) -> dict:
+        """Читає всі стани розмови name."""
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT key, state FROM conversations WHERE name = ?", (name,)
+            ).fetchall()
+        return {tuple(json.loads(key)): pickle.loads(state) for key, state in rows}
+
+    def _write(self, users: dict, conversations: dict) -> None:
+        """Записує пакет змін однією транзакцією."""
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO user_data (user_id, data) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data",
+                    [(uid, blob) for uid, blob in users.items() if blob is not None],
+                )
+                conn.executemany(
+                    "DELETE FROM user_data WHERE user_id = ?",
+                    [(uid,) for uid, blob in users.items() if blob is None],
+                )
+                conn.executemany(
+                    "INSERT INTO conversations (name, key, state) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name, key) DO UPDATE SET state = excluded.state",
+                    [
+                        (name, key, blob)
+                        for (name, key), blob in conversations.items()
+                        if blob is not None
+                    ],
+                )
+                conn.executemany(
+                    "DELETE FROM conversations WHERE name = ? AND key = ?",
+                    [
+                        (name, key)
+                        for (name, key), blob in conversations.items()
+                        if blob is None
+                    ],
+                )
+
+    # --- Відкладений запис ---
+
+    def _take_dirty(self):
+        """Забирає накопичені зміни."""
+        users, self._dirty_users = self._dirty_users, {}
+        conversations, self._dirty_conversations = self._dirty_conversations, {}
+        return users, conversations
+
+    def _schedule_flush(self) -> None:
+        """Запускає фоновий запис, якщо він ще не запущений."""
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(
+                self._flush_dirty()
+            )
+
+    async def _flush_dirty(self) -> None:
+        """Записує накопичені зміни пакетами в окремому потоці."""
+        loop = asyncio.get_running_loop()
+        try:
+            # Даємо Application зафіксувати всі зміни поточного циклу
+            await asyncio.sleep(0)
+            while self._dirty_users or self._dirty_conversations:
+                users, conversations = self._take_dirty()
+                try:
+                    await loop.run_in_executor(
+                        None, self._write, users, conversations
+                    )
+                except Exception as e:
+                    logger.error(f"Помилка запису в {self.path}: {e}", exc_info=True)
+                    # Повертаємо зміни, якщо їх ще не перекрили новіші
+                    for uid, blob in users.items():
+                        self._dirty_users.setdefault(uid, blob)
+                    for key, blob in conversations.items():
+                        self._dirty_conversations.setdefault(key, blob)
+                    break
+        finally:
+            self._flush_task = None
+
+    # --- Ліниве завантаження ---
+
+    async def _load_user(self, user_id: int, user_data: dict) -> None:
+        """Підвантажує збережені дані користувача в його user_data."""
+        try:
+            stored = await asyncio.get_running_loop().run_in_executor(
+                None, self._read_user, user_id
+            )
+            if stored:
+                for key, value in stored.items():
+                    user_data.setdefault(key, value)
+            self._loaded.add(user_id)
+        finally:
+            self._loading.pop(user_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Викликається перед обробкою кожного оновлення користувача."""
+        if user_id in self._loaded:
+            return
+        task = self._loading.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_user(user_id, user_data))
+            self._loading[user_id] = task
+        await asyncio.shield(task)
+
+    # --- Інтерфейс BasePersistence ---
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        """Дані користувачів завантажуються ліниво, тож при старті — порожньо."""
+        return {}
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        """Фіксує зміну user_data для відкладеного запису."""
+        self._dirty_users[user_id] = pickle.dumps(data)
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        """Видаляє дані користувача."""
+        self._loaded.discard(user_id)
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def get_conversations(self, name: str) -> dict:
+        """Повертає стани розмови (вони малі, тож читаються одразу)."""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._read_conversations, name
+        )
+
+    async def update_conversation(
+        self, name: str, key: tuple, new_state: Optional[object]
+    ) -> None:
+        """Фіксує новий стан розмови для відкладеного запису."""
+        blob = None if new_state is None else pickle.dumps(new_state)
+        self._dirty_conversations[(name, json.dumps(list(key)))] = blob
+        self._schedule_flush()
+
+    async def flush(self) -> None:
+        """Дописує всі зміни при зупинці бота та закриває базу."""
+        if self._flush_task:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        users, conversations = self._take_dirty()
+        if users or conversations:
+            self._write(users, conversations)
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        logger.info("Дані користувачів збережено")
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        """chat_data не зберігається."""
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        """chat_data не зберігається."""
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        """chat_data не зберігається."""
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        """chat_data не зберігається."""
+
+    async def get_bot_data(self) -> dict:
+        """bot_data не зберігається."""
+        return {}
+
+    async def update_bot_data(self, data: dict) -> None:
+        """bot_data не зберігається."""
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        """bot_data не зберігається."""
+
+    async def get_callback_data(self) -> None:
+        """callback_data не зберігається."""
+        return None
+
+    async def update_callback_data(self, data) -> None:
+        """callback_data не зберігається."""
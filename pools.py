@@ -0,0 +1,429 @@
+"""Фонові пули заздалегідь згенерованого контенту."""
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Iterable, Optional
+
+from utils import ResourceLoader
+from gpt import (
+    BACKGROUND,
+    INTERACTIVE,
+    generate_quiz_batch,
+    generate_fact_batch,
+    generate_recommendation_batch,
+)
+from dedup import BloomFilter, MinHashIndex
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text: str) -> str:
+    """Нормалізує текст питання для порівняння (регістр, пробіли)."""
+    return " ".join(text.lower().split())
+
+
+def normalize_title(title: str) -> str:
+    """Нормалізує назву твору для порівняння (регістр, лапки, пробіли)."""
+    return normalize_question(title.strip(" \"'«»“”„"))
+
+
+class QuizQuestionPool:
+    """
+    Спільний для всіх користувачів пул готових питань квізу по темах.
+
+    Для кожної теми тримає до POOL_SIZE питань з правильними відповідями.
+    Коли запас падає нижче LOW_WATER, у фоні запускається поповнення
+    пакетними запитами по BATCH_SIZE питань. Користувач, якому питань не
+    вистачило, чекає лише на перший пакет поповнення, а не на все.
+    """
+
+    POOL_SIZE = 20
+    LOW_WATER = 5
+    BATCH_SIZE = 10
+
+    def __init__(self):
+        """Створює порожній пул."""
+        self._items = {}  # quiz_command -> deque[{"question", "answer"}]
+        self._refills = {}  # quiz_command -> asyncio.Task
+        self._batch_ready = {}  # quiz_command -> asyncio.Event (наступний пакет)
+
+    def size(self, quiz_command: str) -> int:
+        """Повертає кількість готових питань для теми."""
+        return len(self._items.get(quiz_command, ()))
+
+    def warm_up(self, quiz_commands: Iterable[str]) -> None:
+        """Запускає початкове заповнення пулу для переліку тем."""
+        for quiz_command in quiz_commands:
+            self._schedule_refill(quiz_command)
+
+    async def take(
+        self, quiz_command: str, seen: Iterable[str] = ()
+    ) -> Optional[dict]:
+        """
+        Видає питання, якого користувач ще не бачив.
+
+        Args:
+            quiz_command: Тема квізу (наприклад "quiz_geography")
+            seen: Питання, які вже були задані користувачу
+
+        Returns:
+            Словник {"question", "answer"} або None, якщо генерація не вдалася
+        """
+        seen_keys = {normalize_question(question) for question in seen}
+
+        item = self._pop_unseen(quiz_command, seen_keys)
+        if item is None:
+            # Пул порожній (холодний старт) — чекаємо на пакети поповнення
+            # по одному, доки не з'явиться нове для користувача питання
+            task = self._schedule_refill(quiz_command)
+            while item is None and not task.done():
+                await self._next_batch(quiz_command, task)
+                item = self._pop_unseen(quiz_command, seen_keys)
+            if item is None:
+                # Поповнення завершилось: помилка поповнення — як і раніше,
+                # викликачу
+                task.result()
+
+        if self.size(quiz_command) < self.LOW_WATER:
+            self._schedule_refill(quiz_command)
+        return item
+
+    async def close(self) -> None:
+        """Скасовує фонові поповнення."""
+        tasks = list(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refills.clear()
+
+    def _pop_unseen(self, quiz_command: str, seen_keys: set) -> Optional[dict]:
+        """Забирає з пулу перше питання, якого немає серед seen_keys."""
+        items = self._items.get(quiz_command)
+        if not items:
+            return None
+        for index, item in enumerate(items):
+            if normalize_question(item["question"]) not in seen_keys:
+                del items[index]
+                return item
+        return None
+
+    async def _next_batch(self, quiz_command: str, task: asyncio.Task) -> None:
+        """Чекає на наступний пакет поповнення теми (або його завершення)."""
+        event = self._batch_ready.setdefault(quiz_command, asyncio.Event())
+        waiter = asyncio.ensure_future(event.wait())
+        try:
+            # Поповнення не скасовується разом з очікуванням
+            await asyncio.wait((task, waiter), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+    def _schedule_refill(self, quiz_command: str) -> asyncio.Task:
+        """Запускає поповнення теми, якщо воно ще не виконується."""
+        task = self._refills.get(quiz_command)
+        if task is None or task.done():
+            task = asyncio.create_task(self._refill(quiz_command))
+            self._refills[quiz_command] = task
+        return task
+
+    async def _refill(self, quiz_command: str) -> None:
+        """Поповнює пул теми пакетами до POOL_SIZE питань."""
+        items = self._items.setdefault(quiz_command, deque())
+        prompt = ResourceLoader.load_prompt("quiz_batch")
+
+        while len(items) < self.POOL_SIZE:
+            batch = await generate_quiz_batch(
+                prompt, quiz_command, self.BATCH_SIZE
+            )
+            known = {normalize_question(item["question"]) for item in items}
+            added = 0
+            for item in batch:
+                key = normalize_question(item["question"])
+                if key not in known and len(items) < self.POOL_SIZE:
+                    known.add(key)
+                    items.append(item)
+                    added += 1
+
+            logger.info(
+                f"Пул квізу {quiz_command}: +{added}, всього {len(items)}"
+            )
+            # Будимо користувачів, що чекають на питання
+            event = self._batch_ready.pop(quiz_command, None)
+            if event is not None:
+                event.set()
+            if not added:
+                # Модель не дала нових питань — не зациклюємося
+                break
+
+
+class FactPool:
+    """
+    Глобальний пул цікавих фактів з фоновим пакетним поповненням.
+
+    Нові факти проходять перевірку на майже-дублікати через MinHashIndex
+    (за всіма фактами, які будь-коли потрапляли в пул), а показані
+    кожному користувачу факти фіксуються у його BloomFilter.
+    """
+
+    POOL_SIZE = 300
+    LOW_WATER = 10
+    BATCH_SIZE = 15
+
+    def __init__(self):
+        """Створює порожній пул."""
+        self._facts = deque(maxlen=self.POOL_SIZE)
+        self._index = MinHashIndex()
+        self._refill_task = None
+
+    def __len__(self) -> int:
+        """Кількість фактів у пулі."""
+        return len(self._facts)
+
+    def warm_up(self) -> None:
+        """Запускає початкове заповнення пулу."""
+        self._schedule_refill()
+
+    def add(self, fact: str) -> bool:
+        """Додає факт, якщо він не є майже-дублікатом уже відомого."""
+        if not fact or not self._index.add(fact):
+            return False
+        self._facts.append(fact)
+        return True
+
+    async def take(self, seen: BloomFilter) -> Optional[str]:
+        """
+        Видає випадковий факт, якого користувач ще не бачив.
+
+        Args:
+            seen: Фільтр показаних користувачу фактів (оновлюється)
+
+        Returns:
+            Текст факту або None, якщо генерація не вдалася
+        """
+        unseen = self._unseen(seen)
+        if not unseen:
+            await asyncio.shield(self._schedule_refill())
+            unseen = self._unseen(seen)
+        if not unseen:
+            return None
+
+        fact = random.choice(unseen)
+        seen.add(fact)
+        if len(unseen) - 1 < self.LOW_WATER:
+            self._schedule_refill()
+        return fact
+
+    async def close(self) -> None:
+        """Скасовує фонове поповнення."""
+        if self._refill_task:
+            self._refill_task.cancel()
+            await asyncio.gather(self._refill_task, return_exceptions=True)
+            self._refill_task = None
+
+    def _unseen(self, seen: BloomFilter) -> list:
+        """Повертає факти, яких немає у фільтрі користувача."""
+        return [fact for fact in self._facts if fact not in seen]
+
+    def _schedule_refill(self) -> asyncio.Task:
+        """Запускає поповнення, якщо воно ще не виконується."""
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+        return self._refill_task
+
+    async def _refill(self) -> None:
+        """Поповнює пул одним пакетним запитом."""
+        prompt = ResourceLoader.load_prompt("random_batch")
+        batch = await generate_fact_batch(prompt, self.BATCH_SIZE)
+        added = sum(1 for fact in batch if self.add(fact))
+        logger.info(
+            f"Пул фактів: +{added} з {len(batch)}, всього {len(self._facts)}"
+        )
+
+
+class RecommendationPool:
+    """
+    Спільний кеш рекомендацій по (категорія, жанр).
+
+    Рекомендації генеруються пакетами по BATCH_SIZE одним структурованим
+    запитом, вже розібраними на назву, опис і рейтинг, та живуть ITEM_TTL
+    секунд. Небажані та вже показані користувачу твори відфільтровуються
+    локально, а серед решти першими видаються найрідше показані (ротація,
+    щоб різні користувачі отримували різне). До моделі звертаємося лише
+    для поповнення кешу; якщо користувач уже бачив увесь повний кеш жанру,
+    нові рекомендації витісняють найчастіше показані.
+    """
+
+    POOL_SIZE = 30
+    LOW_WATER = 5
+    BATCH_SIZE = 5
+    ITEM_TTL = 12 * 3600
+    # Скільки назв передавати моделі як "не повторюй"
+    AVOID_LIMIT = 30
+
+    def __init__(self):
+        """Створює порожній кеш."""
+        self._entries = {}  # (category, genre) -> list[{"item", "expires", "served"}]
+        self._refills = {}  # (category, genre) -> asyncio.Task
+
+    def _live(self, key: tuple) -> list:
+        """Повертає записи жанру, прибираючи прострочені."""
+        now = time.monotonic()
+        entries = self._entries.setdefault(key, [])
+        entries[:] = [entry for entry in entries if entry["expires"] > now]
+        return entries
+
+    def _eligible(self, key: tuple, exclude: set) -> list:
+        """Записи, яких немає серед небажаних/показаних користувачу."""
+        return [
+            entry for entry in self._live(key)
+            if normalize_title(entry["item"]["title"]) not in exclude
+        ]
+
+    def available(self, category: str, genre: str, exclude=()) -> int:
+        """Кількість рекомендацій, які можна видати без запиту до моделі."""
+        exclude = {normalize_title(title) for title in exclude}
+        return len(self._eligible((category, genre), exclude))
+
+    async def take(
+        self,
+        category: str,
+        category_singular: str,
+        genre: str,
+        exclude: Iterable[str] = (),
+        count: int = BATCH_SIZE,
+    ) -> list:
+        """
+        Видає до count різних рекомендацій, яких немає серед exclude.
+
+        Args:
+            category: Категорія ("фільми", "книги", "музику")
+            category_singular: Категорія в однині для промпту
+            genre: Назва жанру
+            exclude: Назви небажаних та вже показаних творів
+            count: Скільки рекомендацій потрібно
+
+        Returns:
+            Список словників {"title", "description", "rating"}
+            (порожній, якщо генерація не вдалася)
+        """
+        key = (category, genre)
+        exclude = list(exclude)
+        exclude_keys = {normalize_title(title) for title in exclude}
+
+        eligible = self._eligible(key, exclude_keys)
+        for _ in range(2):
+            if eligible:
+                break
+            # Холодний кеш або все відфільтровано — чекаємо на поповнення.
+            # Друга спроба — якщо ми приєдналися до фонового поповнення,
+            # яке не знало про exclude цього користувача
+            await asyncio.shield(self._schedule_refill(
+                key, category_singular, INTERACTIVE, exclude
+            ))
+            eligible = self._eligible(key, exclude_keys)
+
+        eligible.sort(key=lambda entry: entry["served"])
+        taken = eligible[:count]
+        for entry in taken:
+            entry["served"] += 1
+        if len(eligible) - len(taken) < self.LOW_WATER:
+            self._schedule_refill(key, category_singular, BACKGROUND)
+        return [dict(entry["item"]) for entry in taken]
+
+    async def close(self) -> None:
+        """Скасовує фонові поповнення."""
+        tasks = list(self._refills.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refills.clear()
+
+    def _schedule_refill(
+        self,
+        key: tuple,
+        category_singular: str,
+        priority: int,
+        avoid: list = (),
+    ) -> asyncio.Task:
+        """Запускає поповнення жанру, якщо воно ще не виконується."""
+        task = self._refills.get(key)
+        if task is None or task.done():
+            task = asyncio.create_task(
+                self._refill(key, category_singular, priority, avoid)
+            )
+            self._refills[key] = task
+        return task
+
+    async def _refill(
+        self,
+        key: tuple,
+        category_singular: str,
+        priority: int,
+        avoid: list = (),
+    ) -> None:
+        """
+        Поповнює кеш жанру одним пакетним запитом.
+
+        Поповнення для користувача (avoid — назви, які він уже бачив)
+        виконується й при повному кеші: місце звільняється від найчастіше
+        показаних записів, інакше такий користувач не отримав би нічого
+        до закінчення ITEM_TTL.
+        """
+        category, genre = key
+        if len(self._live(key)) >= self.POOL_SIZE and not avoid:
+            return
+
+        rating_instruction = (
+            ResourceLoader.load_prompt("rating_instruction")
+            if category == "фільми" else "залиш поле rating порожнім"
+        )
+        prompt = ResourceLoader.format_prompt(
+            "recommendations",
+            category=category,
+            category_singular=category_singular,
+            genre=genre,
+            count=self.BATCH_SIZE,
+            rating_instruction=rating_instruction,
+        )
+        known = [entry["item"]["title"] for entry in self._live(key)]
+        batch = await generate_recommendation_batch(
+            prompt,
+            self.BATCH_SIZE,
+            avoid=(known + list(avoid))[-self.AVOID_LIMIT:],
+            priority=priority,
+        )
+
+        entries = self._live(key)
+        titles = {normalize_title(entry["item"]["title"]) for entry in entries}
+        expires = time.monotonic() + self.ITEM_TTL
+        fresh = []
+        for item in batch:
+            title = normalize_title(item["title"])
+            if title in titles:
+                continue
+            if category != "фільми":
+                # Рейтинг показуємо лише для фільмів
+                item["rating"] = ""
+            titles.add(title)
+            fresh.append({"item": item, "expires": expires, "served": 0})
+
+        overflow = len(entries) + len(fresh) - self.POOL_SIZE
+        if overflow > 0:
+            if avoid:
+                entries.sort(key=lambda entry: (-entry["served"], entry["expires"]))
+                del entries[:overflow]
+            else:
+                fresh = fresh[:max(0, self.POOL_SIZE - len(entries))]
+        entries.extend(fresh)
+
+        logger.info(
+            f"Кеш рекомендацій {category}/{genre}: +{len(fresh)} з {len(batch)}, "
+            f"всього {len(entries)}"
+        )
+
+
+# Спільні пули для всіх користувачів
+quiz_pool = QuizQuestionPool()
+fact_pool = FactPool()
+recommendation_pool = RecommendationPool()
@@ -0,0 +1,106 @@
+"""Паралельна обробка оновлень зі збереженням порядку в межах чату."""
+import asyncio
+import logging
+from typing import Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обробляє оновлення різних чатів паралельно, а одного чату — по черзі.
+
+    Кожен чат має власну чергу (asyncio.Lock з FIFO-пробудженням), тому
+    ConversationHandler і читання-зміна-запис context.user_data в
+    обробниках бачать оновлення користувача строго по порядку. Загальна
+    кількість обробників, що виконуються одночасно, обмежена
+    max_concurrent; оновлення, які чекають на свій чат, слот не займають.
+    """
+
+    # Скільки оновлень може одночасно бути прийнято в обробку (включно з
+    # тими, що чекають у черзі свого чату)
+    MAX_PENDING_UPDATES = 4096
+
+    def __init__(self, max_concurrent: int = 256):
+        """Створює процесор з лімітом одночасних обробників."""
+        super().__init__(max_concurrent_updates=self.MAX_PENDING_UPDATES)
+        self.max_concurrent = max_concurrent
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._queue_depths: Dict[int, int] = {}
+        self.peak_queue_depth = 0
+
+    @staticmethod
+    def _chat_key(update: object) -> Optional[int]:
+        """Ключ впорядкування: id чату або користувача."""
+        if not isinstance(update, Update):
+            return None
+        chat = update.effective_chat or update.effective_user
+        return chat.id if chat else None
+
+    def queue_depth(self, chat_id: int) -> int:
+        """Кількість оновлень чату, що обробляються або чекають."""
+        return self._queue_depths.get(chat_id, 0)
+
+    def queue_depths(self) -> Dict[int, int]:
+        """Глибина черг усіх активних чатів."""
+        return dict(self._queue_depths)
+
+    def metrics(self) -> dict:
+        """Зведені метрики процесора для логування."""
+        depths = self._queue_depths.values()
+        return {
+            "active_chats": len(self._queue_depths),
+            "queued_updates": sum(depths),
+            "max_chat_queue": max(depths, default=0),
+            "peak_chat_queue": self.peak_queue_depth,
+        }
+
+    async def log_metrics(self, interval: float = 60.0) -> None:
+        """Періодично пише метрики черг у лог (фонове завдання)."""
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.metrics()
+            if stats["active_chats"]:
+                logger.info(
+                    "Черги оновлень: чатів {active_chats}, оновлень "
+                    "{queued_updates}, найдовша {max_chat_queue}, "
+                    "пік {peak_chat_queue}".format(**stats)
+                )
+
+    async def do_process_update(
+        self, update: object, coroutine: Awaitable
+    ) -> None:
+        """Чекає своєї черги в чаті, потім слот, і виконує обробку."""
+        key = self._chat_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        depth = self._queue_depths.get(key, 0) + 1
+        self._queue_depths[key] = depth
+        self.peak_queue_depth = max(self.peak_queue_depth, depth)
+        lock = self._chat_locks.setdefault(key, asyncio.Lock())
+        try:
+            async with lock:
+                async with self._slots:
+                    await coroutine
+        finally:
+            depth = self._queue_depths[key] - 1
+            if depth:
+                self._queue_depths[key] = depth
+            else:
+                # Чат без оновлень — звільняємо пам'ять
+                del self._queue_depths[key]
+                self._chat_locks.pop(key, None)
+
+    async def initialize(self) -> None:
+        """Створює семафор у циклі подій Application."""
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+
+    async def shutdown(self) -> None:
+        """Нічого звільняти не потрібно."""
@@ -0,0 +1,136 @@
+"""Черга вихідних запитів до Telegram з глобальним лімітом та лімітом чату."""
+import logging
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from utils import FairScheduler, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Пріоритети вихідних запитів (rate_limit_args методів бота)
+INTERACTIVE = 0
+BULK = 1
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Пауза з RetryAfter у секундах (PTB 21+ віддає timedelta)."""
+    retry_after = error.retry_after
+    if hasattr(retry_after, "total_seconds"):
+        retry_after = retry_after.total_seconds()
+    return float(retry_after)
+
+
+class TelegramRateLimiter(FairScheduler, BaseRateLimiter):
+    """
+    Планувальник вихідних запитів бота з лімітами Telegram.
+
+    Через rate limiter Application проходять усі виклики Bot API, тож
+    reply_text, send_photo, edit_text тощо з обробників не потребують
+    змін. Запити до чату (з chat_id) обмежуються глобальним відром
+    (~30 повідомлень/с на бота) та відром чату (~1/с в особистому чаті,
+    20/хв у групі); решта запитів (getUpdates, answerCallbackQuery, ...)
+    виконуються без черги.
+
+    Черга — FairScheduler: інтерактивні запити раніше масових
+    (rate_limit_args=BULK), а всередині пріоритету чати обслуговуються по
+    колу. Відповідь 429 (RetryAfter) призупиняє всі надсилання на
+    retry_after секунд, після чого запит повторюється.
+    """
+
+    GLOBAL_RATE = 30.0
+    CHAT_BURST = 3
+    CHAT_RATE = 1.0
+    GROUP_BURST = 3
+    GROUP_RATE = 20 / 60
+    MAX_RETRIES = 3
+    # Після скількох відер чатів прибирати повні (неактивні)
+    CHAT_BUCKETS_LIMIT = 10_000
+
+    NAME = "Черга надсилання"
+    PRIORITY_NAMES = {INTERACTIVE: "інтерактивних", BULK: "масових"}
+
+    def __init__(self, global_rate: float = GLOBAL_RATE):
+        """Створює планувальник з глобальним лімітом global_rate запитів/с."""
+        super().__init__((INTERACTIVE, BULK))
+        self.global_bucket = TokenBucket(max(global_rate, 1), global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+
+    # --- Ліміти ---
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        """Відро чату (групи мають власний, суворіший ліміт)."""
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.CHAT_BUCKETS_LIMIT:
+                self._prune()
+            if chat_id < 0:
+                bucket = TokenBucket(self.GROUP_BURST, self.GROUP_RATE)
+            else:
+                bucket = TokenBucket(self.CHAT_BURST, self.CHAT_RATE)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune(self) -> None:
+        """Прибирає відра чатів, що повністю поповнились (неактивні)."""
+        waiting = self.waiting_keys()
+        self._chat_buckets = {
+            chat_id: bucket
+            for chat_id, bucket in self._chat_buckets.items()
+            if chat_id in waiting or bucket.level < bucket.capacity
+        }
+
+    def _delay(self, chat_id: int, cost: float) -> float:
+        """Скільки чекати до можливості надіслати запит у чат."""
+        return max(
+            self.global_bucket.delay(cost),
+            self._chat_bucket(chat_id).delay(cost),
+        )
+
+    def _consume(self, chat_id: int, cost: float) -> None:
+        """Списує запит з глобального відра та відра чату."""
+        self.global_bucket.consume(cost)
+        self._chat_bucket(chat_id).consume(cost)
+
+    # --- Інтерфейс BaseRateLimiter ---
+
+    async def initialize(self) -> None:
+        """Нічого ініціалізувати не потрібно (диспетчер стартує ліниво)."""
+
+    async def shutdown(self) -> None:
+        """Зупиняє диспетчер і звільняє запити, що чекають."""
+        await self.close()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Any:
+        """Виконує запит до Bot API з урахуванням лімітів і RetryAfter."""
+        chat_id = data.get("chat_id")
+        if isinstance(chat_id, str) and chat_id.lstrip("-").isdigit():
+            # Числовий id рядком (наприклад, з конфігурації)
+            chat_id = int(chat_id)
+        if not isinstance(chat_id, int):
+            # Запити без чату (або з @username каналу) не обмежуємо
+            return await callback(*args, **kwargs)
+
+        priority = INTERACTIVE if rate_limit_args is None else rate_limit_args
+        for attempt in range(self.MAX_RETRIES + 1):
+            await self.acquire(chat_id, 1, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after = retry_after_seconds(e)
+                self.backoff(retry_after)
+                if attempt == self.MAX_RETRIES:
+                    raise
+                logger.warning(
+                    f"Telegram 429 ({endpoint}, чат {chat_id}): "
+                    f"повтор через {retry_after} с"
+                )
@@ -0,0 +1,254 @@
+"""
+Розподіл оновлень між процесами-воркерами за chat id.
+
+Фронтовий процес отримує оновлення від Telegram (polling або webhook) і
+за консистентним хешуванням chat id передає їх одному з N воркерів.
+Кожен воркер — окремий процес зі своїм Application та повним графом
+обробників (TelegramBot.setup_handlers), тож порядок оновлень і стан
+розмови користувача завжди локальні для одного воркера.
+
+Керування фронтовим процесом сигналами (Unix):
+    SIGHUP  — почерговий перезапуск воркерів з дренажем
+    SIGUSR1 — додати воркер (з перебалансуванням)
+    SIGUSR2 — прибрати воркер (з перебалансуванням)
+"""
+import queue
+import signal
+import asyncio
+import bisect
+import hashlib
+import logging
+import multiprocessing
+from typing import Iterable, Optional
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from startup import startup_timer
+
+logger = logging.getLogger(__name__)
+
+# Скільки секунд воркер чекає на оновлення, перш ніж перевірити фронт
+WORKER_POLL_TIMEOUT = 1.0
+
+
+class HashRing:
+    """Кільце консистентного хешування з віртуальними вузлами."""
+
+    REPLICAS = 100
+
+    def __init__(self, nodes: Iterable[int]):
+        """Будує кільце для переліку вузлів."""
+        self.nodes = tuple(sorted(nodes))
+        points = sorted(
+            (self._hash(f"{node}:{replica}"), node)
+            for node in self.nodes
+            for replica in range(self.REPLICAS)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        """Стабільний хеш (однаковий у всіх процесах і між запусками)."""
+        digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8)
+        return int.from_bytes(digest.digest(), "big")
+
+    def node_for(self, key) -> int:
+        """Повертає вузол, що відповідає ключу."""
+        index = bisect.bisect(self._hashes, self._hash(str(key)))
+        return self._nodes[index % len(self._nodes)]
+
+
+def run_worker(index: int, updates) -> None:
+    """Точка входу процесу-воркера."""
+    # Зупинкою керує фронтовий процес (через дренаж), а не Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Імпорт тут, щоб уникнути циклічного імпорту bot <-> sharding
+    from bot import TelegramBot
+    from credentials import BOT_TOKEN
+
+    asyncio.run(_serve_worker(TelegramBot(BOT_TOKEN), index, updates))
+
+
+async def _serve_worker(bot, index: int, updates) -> None:
+    """Обробляє оновлення з черги, доки не прийде сигнал дренажу (None)."""
+    application = bot.build_application(updater=False)
+    loop = asyncio.get_running_loop()
+    parent = multiprocessing.parent_process()
+
+    await application.initialize()
+    startup_timer.mark("ініціалізація Application")
+    await bot.start_background(application)
+    await application.start()
+    logger.info(f"Воркер {index} запущено")
+
+    try:
+        while True:
+            try:
+                data = await loop.run_in_executor(
+                    None, updates.get, True, WORKER_POLL_TIMEOUT
+                )
+            except queue.Empty:
+                if parent is not None and not parent.is_alive():
+                    logger.warning(f"Воркер {index}: фронт зупинився")
+                    break
+                continue
+
+            if data is None:
+                break
+            await application.update_queue.put(
+                Update.de_json(data, application.bot)
+            )
+    finally:
+        # stop() дообробляє чергу, shutdown() записує персистентність
+        await application.stop()
+        await application.shutdown()
+        await bot.post_shutdown(application)
+        logger.info(f"Воркер {index} зупинено")
+
+
+class ShardRouter:
+    """Фронтовий маршрутизатор оновлень між процесами-воркерами."""
+
+    HEALTH_INTERVAL = 5.0
+    DRAIN_TIMEOUT = 60.0
+
+    def __init__(self, workers: int):
+        """Готує маршрутизатор на workers процесів."""
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ring = HashRing(range(workers))
+        self._workers = {}  # index -> (Process, Queue)
+        self._held = {}  # index -> оновлення, відкладені на час дренажу
+        self._paused: Optional[list] = None  # буфер на час перебалансування
+        self._monitor: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _spawn(self, index: int, updates=None) -> None:
+        """Запускає процес-воркер (з новою або наявною чергою)."""
+        updates = updates or self._ctx.Queue()
+        process = self._ctx.Process(
+            target=run_worker,
+            args=(index, updates),
+            name=f"bot-worker-{index}",
+        )
+        process.start()
+        self._workers[index] = (process, updates)
+
+    async def start(self) -> None:
+        """Запускає воркери, моніторинг та обробники сигналів."""
+        for index in self._ring.nodes:
+            self._spawn(index)
+        self._monitor = asyncio.create_task(self._watch())
+
+        loop = asyncio.get_running_loop()
+        handlers = {
+            "SIGHUP": self.rolling_restart,
+            "SIGUSR1": lambda: self.resize(len(self._ring.nodes) + 1),
+            "SIGUSR2": lambda: self.resize(len(self._ring.nodes) - 1),
+        }
+        for name, action in handlers.items():
+            if hasattr(signal, name):
+                loop.add_signal_handler(
+                    getattr(signal, name),
+                    lambda action=action: asyncio.create_task(action()),
+                )
+        logger.info(f"Запущено воркерів: {len(self._workers)}")
+
+    async def route(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        """Обробник фронту: передає оновлення воркеру його чату."""
+        chat = update.effective_chat or update.effective_user
+        key = chat.id if chat else update.update_id
+        self.dispatch(key, update.to_dict())
+
+    def dispatch(self, key, data: dict) -> None:
+        """Кладе оновлення в чергу воркера (або в буфер на час дренажу)."""
+        if self._paused is not None:
+            self._paused.append((key, data))
+            return
+
+        index = self._ring.node_for(key)
+        if index in self._held:
+            self._held[index].append(data)
+            return
+        self._workers[index][1].put(data)
+
+    async def _drain(self, index: int) -> None:
+        """Дає воркеру дообробити чергу, зберегти дані та завершитися."""
+        process, updates = self._workers.pop(index)
+        updates.put(None)
+        await asyncio.get_running_loop().run_in_executor(
+            None, process.join, self.DRAIN_TIMEOUT
+        )
+        if process.is_alive():
+            logger.error(f"Воркер {index} не завершився вчасно, зупиняю")
+            process.terminate()
+
+    async def restart_worker(self, index: int) -> None:
+        """Перезапускає один воркер; його оновлення чекають у буфері."""
+        async with self._lock:
+            self._held.setdefault(index, [])
+            try:
+                await self._drain(index)
+                self._spawn(index)
+            finally:
+                for data in self._held.pop(index, []):
+                    self._workers[index][1].put(data)
+
+    async def rolling_restart(self) -> None:
+        """Почергово перезапускає всі воркери (наприклад, після деплою)."""
+        for index in self._ring.nodes:
+            await self.restart_worker(index)
+        logger.info("Почерговий перезапуск воркерів завершено")
+
+    async def resize(self, workers: int) -> None:
+        """
+        Змінює кількість воркерів з перебалансуванням чатів.
+
+        Усі воркери дренажуються (зберігають user_data та стани розмов),
+        після чого запускаються з новим кільцем і підвантажують стан
+        переміщених чатів з бази. Оновлення на цей час буферизуються.
+        """
+        if workers < 1:
+            return
+        async with self._lock:
+            self._paused = []
+            try:
+                await asyncio.gather(
+                    *(self._drain(index) for index in list(self._workers))
+                )
+                self._ring = HashRing(range(workers))
+                for index in self._ring.nodes:
+                    self._spawn(index)
+            finally:
+                buffered, self._paused = self._paused, None
+                for key, data in buffered:
+                    self.dispatch(key, data)
+        logger.info(f"Кількість воркерів: {workers}")
+
+    async def _watch(self) -> None:
+        """Перезапускає воркери, що впали, зберігаючи їхню чергу."""
+        while True:
+            await asyncio.sleep(self.HEALTH_INTERVAL)
+            if self._lock.locked():
+                continue
+            for index, (process, updates) in list(self._workers.items()):
+                if not process.is_alive():
+                    logger.error(
+                        f"Воркер {index} завершився з кодом "
+                        f"{process.exitcode}, перезапускаю"
+                    )
+                    self._spawn(index, updates)
+
+    async def stop(self) -> None:
+        """Зупиняє моніторинг і дренажує всі воркери."""
+        if self._monitor:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        async with self._lock:
+            await asyncio.gather(
+                *(self._drain(index) for index in list(self._workers))
+            )
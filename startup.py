@@ -0,0 +1,49 @@
+"""Вимірювання часу запуску бота за фазами."""
+import time
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Секундомір фаз запуску процесу.
+
+    Фази послідовні: mark(name) записує час від попередньої позначки
+    (або від імпорту цього модуля, тобто майже від старту процесу), а
+    report() пише в лог розбивку з часткою кожної фази. Детальніший
+    профіль імпорту модулів: python -X importtime bot.py.
+    """
+
+    def __init__(self):
+        """Запускає секундомір."""
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, name: str) -> float:
+        """Завершує фазу name; повертає її тривалість у секундах."""
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.phases.append((name, elapsed))
+        return elapsed
+
+    def elapsed(self) -> float:
+        """Час від запуску процесу в секундах."""
+        return time.perf_counter() - self.started
+
+    def report(self) -> None:
+        """Пише розбивку часу запуску в лог."""
+        total = self._last - self.started
+        lines = [
+            f"  {name:<36} {elapsed * 1000:7.0f} мс ({elapsed / total:.0%})"
+            for name, elapsed in self.phases
+        ] if total > 0 else []
+        logger.info(
+            "Запуск за {:.0f} мс:\n{}".format(total * 1000, "\n".join(lines))
+        )
+
+
+startup_timer = StartupTimer()
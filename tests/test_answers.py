@@ -0,0 +1,83 @@
+"""Тести локальної перевірки відповідей квізу (answers.py)."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from answers import edit_distance, judge_answer, normalize_answer
+
+
+class NormalizeAnswerTest(unittest.TestCase):
+    """Нормалізація відповіді перед порівнянням."""
+
+    def test_case_apostrophes_and_stop_words(self):
+        self.assertEqual(normalize_answer("Річка  Дніпро!"), "дніпро")
+        self.assertEqual(normalize_answer("Кам’янець"), "кам'янець")
+
+    def test_only_stop_words_kept(self):
+        self.assertEqual(normalize_answer("Місто"), "місто")
+
+
+class JudgeAnswerTest(unittest.TestCase):
+    """Рішення judge_answer: True, False або None (перевіряє ChatGPT)."""
+
+    def test_exact_and_alias(self):
+        self.assertIs(judge_answer("ніл", "Ніл"), True)
+        self.assertIs(judge_answer("USA", "США", aliases=["USA"]), True)
+
+    def test_answer_inside_short_phrase(self):
+        self.assertIs(judge_answer("мабуть це Ніл", "Ніл"), True)
+        self.assertIs(judge_answer("1945 рік", "1945"), True)
+
+    def test_typo_accepted(self):
+        self.assertIs(judge_answer("Амазнка", "Амазонка"), True)
+        self.assertIs(judge_answer("Леонардо да Вінчи", "Леонардо да Вінчі"), True)
+
+    def test_clear_mismatch(self):
+        self.assertIs(judge_answer("Париж", "Лондон"), False)
+        self.assertIs(judge_answer("Канада", "Сполучені Штати Америки"), False)
+        self.assertIs(judge_answer("", "Лондон"), False)
+
+    def test_partial_answer_left_to_model(self):
+        self.assertIsNone(judge_answer("Вінчі", "Леонардо да Вінчі"))
+
+    def test_abbreviation_left_to_model(self):
+        self.assertIsNone(judge_answer("Сполучені Штати", "США"))
+        self.assertIsNone(judge_answer("США", "Сполучені Штати Америки"))
+
+    def test_other_script_left_to_model(self):
+        self.assertIsNone(judge_answer("Everest", "Джомолунгма"))
+
+    def test_similar_short_names_not_accepted(self):
+        self.assertIsNone(judge_answer("Австрія", "Австралія"))
+        self.assertIsNone(judge_answer("Австралія", "Австрія"))
+
+    def test_numbers_must_match_exactly(self):
+        self.assertIs(judge_answer("100", "1000"), False)
+        self.assertIs(judge_answer("206", "2006"), False)
+        self.assertIs(judge_answer("в 1946", "1945"), False)
+
+    def test_number_in_words_left_to_model(self):
+        self.assertIsNone(judge_answer("сто", "100"))
+
+    def test_negation_not_accepted(self):
+        self.assertIsNone(judge_answer("не Ніл", "Ніл"))
+
+    def test_several_candidates_not_accepted(self):
+        self.assertIsNone(judge_answer("Ніл або Амазонка", "Ніл"))
+        self.assertIsNone(judge_answer("Ніл, Амазонка", "Ніл"))
+        self.assertIsNone(judge_answer("Ніл / Амазонка", "Ніл"))
+
+
+class EditDistanceTest(unittest.TestCase):
+    """Відстань Левенштейна."""
+
+    def test_distance(self):
+        self.assertEqual(edit_distance("австрія", "австралія"), 2)
+        self.assertEqual(edit_distance("ніл", "ніл"), 0)
+        self.assertEqual(edit_distance("", "ніл"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
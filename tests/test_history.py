@@ -0,0 +1,45 @@
+"""Тести історії розмов з бюджетом токенів (history.py)."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import ConversationHistory
+
+
+class TrimTest(unittest.TestCase):
+    """Витіснення старих пар за бюджетом."""
+
+    def test_oldest_pairs_evicted_first(self):
+        history = ConversationHistory(60)
+        history.add_turn("перше питання " * 3, "перша відповідь " * 3)
+        evicted = history.add_turn("друге питання " * 3, "друга відповідь " * 3)
+        self.assertEqual([item["role"] for item in evicted], ["user", "assistant"])
+        self.assertTrue(evicted[0]["content"].startswith("перше"))
+        self.assertEqual(len(history), 2)
+        self.assertLessEqual(history.tokens, 60)
+
+    def test_oversized_turn_is_shortened_not_evicted(self):
+        history = ConversationHistory(100)
+        history.add_turn("старе", "старе")
+        evicted = history.add_turn("x" * 500, "y" * 500)
+
+        messages = history.messages()
+        self.assertEqual([item["role"] for item in messages], ["user", "assistant"])
+        self.assertTrue(messages[0]["content"].startswith("x"))
+        self.assertTrue(messages[1]["content"].startswith("y"))
+        self.assertLessEqual(history.tokens, 100)
+        # Витіснено лише стару пару
+        self.assertEqual([item["content"] for item in evicted], ["старе", "старе"])
+
+    def test_long_answer_keeps_question(self):
+        history = ConversationHistory(100)
+        history.add_turn("коротке питання", "y" * 2000)
+        messages = history.messages()
+        self.assertEqual(messages[0]["content"], "коротке питання")
+        self.assertLessEqual(history.tokens, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Тести черг з лімітами: OpenAI (gpt.RequestScheduler) та Telegram (ratelimit.py)."""
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram.error import RetryAfter
+
+from gpt import BACKGROUND, INTERACTIVE, RequestScheduler, set_request_context
+from ratelimit import TelegramRateLimiter
+from utils import TokenBucket
+
+
+def make_scheduler() -> RequestScheduler:
+    """Планувальник з порожнім швидким відром запитів (черга до кожного)."""
+    scheduler = RequestScheduler(rpm=60, tpm=100_000)
+    scheduler.requests = TokenBucket(1, 200)
+    scheduler.requests.consume(1)
+    return scheduler
+
+
+class RequestSchedulerTest(unittest.TestCase):
+    """Порядок видачі дозволів запитам до OpenAI."""
+
+    def run_requests(self, scheduler, requests):
+        """Ставить запити (user_id, priority) у чергу і повертає порядок видачі."""
+        served = []
+
+        async def request(user_id, priority):
+            set_request_context(user_id, priority)
+            await scheduler.reserve(10)
+            served.append(user_id)
+
+        async def main():
+            tasks = []
+            for user_id, priority in requests:
+                tasks.append(asyncio.create_task(request(user_id, priority)))
+                # Запити стають у чергу в порядку створення
+                await asyncio.sleep(0)
+            await asyncio.gather(*tasks)
+            await scheduler.close()
+
+        asyncio.run(main())
+        return served
+
+    def test_interactive_before_background(self):
+        served = self.run_requests(make_scheduler(), [
+            ("фон", BACKGROUND),
+            ("фон", BACKGROUND),
+            ("користувач", INTERACTIVE),
+        ])
+        self.assertEqual(served, ["користувач", "фон", "фон"])
+
+    def test_users_served_round_robin(self):
+        served = self.run_requests(make_scheduler(), [
+            (1, INTERACTIVE),
+            (1, INTERACTIVE),
+            (1, INTERACTIVE),
+            (2, INTERACTIVE),
+        ])
+        self.assertEqual(served, [1, 2, 1, 1])
+
+    def test_metrics_count_waits(self):
+        scheduler = make_scheduler()
+        self.run_requests(scheduler, [(1, INTERACTIVE), (2, BACKGROUND)])
+        metrics = scheduler.metrics()
+        self.assertEqual(metrics["sent"], 2)
+        self.assertEqual(metrics["delayed"], 2)
+        self.assertEqual(metrics["queues"], {INTERACTIVE: 0, BACKGROUND: 0})
+
+
+class TelegramRateLimiterTest(unittest.TestCase):
+    """Черга надсилання з відрами чатів і повтором після 429."""
+
+    def setUp(self):
+        self.limiter = TelegramRateLimiter(global_rate=1000)
+        self.limiter.CHAT_RATE = 50
+
+    def send(self, chat_id, callback, rate_limit_args=None):
+        """Запит до Bot API через rate limiter."""
+        return self.limiter.process_request(
+            callback, (), {}, "sendMessage", {"chat_id": chat_id}, rate_limit_args
+        )
+
+    def test_busy_chat_does_not_block_others(self):
+        order = []
+
+        def callback(chat_id):
+            async def call():
+                order.append(chat_id)
+            return call
+
+        async def main():
+            # Відро чату 1 порожнє — його запит чекає поповнення
+            self.limiter._chat_bucket(1).consume(self.limiter.CHAT_BURST)
+            await asyncio.gather(
+                self.send(1, callback(1)),
+                self.send(2, callback(2)),
+            )
+            await self.limiter.shutdown()
+
+        asyncio.run(main())
+        self.assertEqual(order, [2, 1])
+
+    def test_retry_after_pauses_and_repeats(self):
+        calls = []
+
+        async def callback():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RetryAfter(0)
+            return "ok"
+
+        async def main():
+            result = await self.send(1, callback)
+            await self.limiter.shutdown()
+            return result
+
+        self.assertEqual(asyncio.run(main()), "ok")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.limiter.metrics()["flood_waits"], 1)
+
+    def test_chat_id_forms(self):
+        async def callback():
+            return "ok"
+
+        async def main():
+            # Числовий id рядком обмежується як звичайний чат
+            await self.send("-100123", callback)
+            # @username каналу проходить без черги
+            await self.send("@channel", callback)
+            await self.limiter.shutdown()
+
+        asyncio.run(main())
+        self.assertEqual(set(self.limiter._chat_buckets), {-100123})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Тести розподілу чатів між воркерами (sharding.HashRing)."""
+import os
+import sys
+import unittest
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sharding import HashRing
+
+CHATS = range(-5000, 5000, 7)
+
+
+class HashRingTest(unittest.TestCase):
+    """Стабільне й рівномірне розміщення ключів на кільці."""
+
+    def test_placement_is_stable(self):
+        first, second = HashRing(range(4)), HashRing([3, 2, 1, 0])
+        for chat_id in CHATS:
+            self.assertEqual(first.node_for(chat_id), second.node_for(chat_id))
+
+    def test_keys_spread_over_all_nodes(self):
+        ring = HashRing(range(4))
+        counts = Counter(ring.node_for(chat_id) for chat_id in CHATS)
+        self.assertEqual(set(counts), {0, 1, 2, 3})
+        share = len(CHATS) / 4
+        for count in counts.values():
+            self.assertGreater(count, share * 0.7)
+            self.assertLess(count, share * 1.3)
+
+    def test_new_node_takes_keys_only_from_others(self):
+        before, after = HashRing(range(3)), HashRing(range(4))
+        moved = [
+            chat_id for chat_id in CHATS
+            if before.node_for(chat_id) != after.node_for(chat_id)
+        ]
+        # Переїжджають лише ключі нового вузла (~1/4), а не весь розподіл
+        self.assertTrue(all(after.node_for(chat_id) == 3 for chat_id in moved))
+        self.assertLess(len(moved), len(CHATS) * 0.35)
+
+
+if __name__ == "__main__":
+    unittest.main()
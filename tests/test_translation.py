@@ -0,0 +1,108 @@
+"""Тести пам'яті перекладів і розбиття тексту на сегменти (translation.py)."""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation import (
+    TranslationMemory,
+    join_segments,
+    split_chunks,
+    split_segments,
+)
+
+TEXTS = [
+    "Привіт.",
+    "Перше речення. Друге речення! Третє?",
+    "Рядок один\nРядок два\n\n  Новий абзац…  Кінець.",
+    "  Пробіли на початку. І в кінці.  ",
+    "2024. 🙂 https://example.com",
+    "",
+]
+
+
+class SegmentsTest(unittest.TestCase):
+    """Розбиття на речення та частини без втрати тексту."""
+
+    def test_split_join_round_trip(self):
+        for text in TEXTS:
+            segments, separators = split_segments(text)
+            self.assertEqual(len(separators), len(segments) - 1)
+            self.assertEqual(join_segments(segments, separators), text)
+
+    def test_sentences_split(self):
+        segments, _ = split_segments("Перше речення. Друге речення! Третє?")
+        self.assertEqual(segments, ["Перше речення.", "Друге речення!", "Третє?"])
+
+    def test_chunks_round_trip_and_size(self):
+        paragraph = " ".join(f"Речення номер {index}." for index in range(40))
+        text = "\n\n".join([paragraph, "Короткий абзац.", paragraph])
+        chunks, separators = split_chunks(text, max_chars=200)
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(join_segments(chunks, separators), text)
+        self.assertTrue(all(len(chunk) <= 200 for chunk in chunks))
+
+
+class TranslationMemoryTest(unittest.TestCase):
+    """Два рівні пам'яті: LRU в пам'яті та SQLite на диску."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "memory.sqlite3")
+        self.memory = TranslationMemory(self.path)
+
+    def tearDown(self):
+        self.memory.close()
+        self.directory.cleanup()
+
+    def test_lookup_normalizes_whitespace(self):
+        async def main():
+            await self.memory.store("англійська", [("Добрий  день", "Good day")])
+            return await self.memory.lookup(
+                "англійська", [" Добрий день ", "Інше", "Добрий день"]
+            )
+
+        self.assertEqual(asyncio.run(main()), ["Good day", None, "Good day"])
+        self.assertEqual((self.memory.hits, self.memory.misses), (2, 1))
+
+    def test_languages_kept_apart(self):
+        async def main():
+            await self.memory.store("англійська", [("Так", "Yes")])
+            return await self.memory.lookup("німецька", ["Так"])
+
+        self.assertEqual(asyncio.run(main()), [None])
+
+    def test_evicted_entries_read_from_disk(self):
+        self.memory.MEMORY_SIZE = 2
+
+        async def main():
+            await self.memory.store("англійська", [
+                ("Один", "One"), ("Два", "Two"), ("Три", "Three"),
+            ])
+            self.assertNotIn(("англійська", "Один"), self.memory._memory)
+            result = await self.memory.lookup("англійська", ["Один"])
+            # Знайдений на диску запис повертається в LRU
+            self.assertIn(("англійська", "Один"), self.memory._memory)
+            self.assertEqual(len(self.memory._memory), 2)
+            return result
+
+        self.assertEqual(asyncio.run(main()), ["One"])
+
+    def test_survives_restart(self):
+        async def main():
+            await self.memory.store("англійська", [("Дякую", "Thank you")])
+            self.memory.close()
+            restarted = TranslationMemory(self.path)
+            try:
+                return await restarted.lookup("англійська", ["Дякую"])
+            finally:
+                restarted.close()
+
+        self.assertEqual(asyncio.run(main()), ["Thank you"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,343 @@
+"""Пам'ять перекладів (translation memory) на рівні речень."""
+import os
+import re
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from utils import ResourceLoader
+from gpt import translate_segments, translate_text
+
+logger = logging.getLogger(__name__)
+
+# Межі сегментів: пробіли після кінця речення або перенесення рядків
+_BOUNDARY = re.compile(r"((?<=[.!?…])\s+|\s*\n\s*)")
+# Сегменти без літер (числа, емодзі, посилання) не перекладаються
+_HAS_LETTERS = re.compile(r"[^\W\d_]")
+# Межі абзаців (порожній рядок)
+_PARAGRAPH = re.compile(r"(\n\s*\n)")
+
+# Тексти, довші за CHUNK_CHARS, перекладаються частинами паралельно
+CHUNK_CHARS = 1500
+MAX_PARALLEL_CHUNKS = 4
+
+
+def split_segments(text: str) -> Tuple[List[str], List[str]]:
+    """
+    Розбиває текст на речення та роздільники між ними.
+
+    Returns:
+        (сегменти, роздільники), де len(роздільники) == len(сегменти) - 1;
+        join_segments(сегменти, роздільники) відновлює текст
+    """
+    parts = _BOUNDARY.split(text)
+    return parts[::2], parts[1::2]
+
+
+def join_segments(segments: List[str], separators: List[str]) -> str:
+    """Збирає текст із сегментів і роздільників у вихідному порядку."""
+    parts = [segments[0]]
+    for separator, segment in zip(separators, segments[1:]):
+        parts.append(separator)
+        parts.append(segment)
+    return "".join(parts)
+
+
+def split_chunks(
+    text: str, max_chars: int = CHUNK_CHARS
+) -> Tuple[List[str], List[str]]:
+    """
+    Розбиває довгий текст на частини до max_chars символів.
+
+    Частини складаються з цілих абзаців; задовгі абзаци діляться по
+    реченнях (речення довше за max_chars лишається цілим).
+
+    Returns:
+        (частини, роздільники) у форматі split_segments
+    """
+    parts = _PARAGRAPH.split(text)
+    units = []  # (абзац або речення, роздільник після нього)
+    for paragraph, separator in zip(parts[::2], parts[1::2] + [""]):
+        if len(paragraph) <= max_chars:
+            units.append((paragraph, separator))
+            continue
+        sentences, separators = split_segments(paragraph)
+        units.extend(zip(sentences, separators + [separator]))
+
+    chunks, separators = [], []
+    current, pending = "", ""
+    for unit, separator in units:
+        if current and len(current) + len(pending) + len(unit) > max_chars:
+            chunks.append(current)
+            separators.append(pending)
+            current = unit
+        else:
+            current = f"{current}{pending}{unit}" if current else unit
+        pending = separator
+    chunks.append(current)
+    return chunks, separators
+
+
+def normalize_segment(segment: str) -> str:
+    """Ключ сегмента: текст без зайвих пробілів."""
+    return " ".join(segment.split())
+
+
+def needs_translation(segment: str) -> bool:
+    """Чи містить сегмент текст, який треба перекладати."""
+    return bool(_HAS_LETTERS.search(segment))
+
+
+class TranslationMemory:
+    """
+    Кеш перекладів по (мова, нормалізований сегмент).
+
+    Два рівні: LRU в пам'яті (MEMORY_SIZE записів) та SQLite на диску,
+    який переживає перезапуски і спільний для воркерів. Повторений текст
+    повертається з пам'яті без звернення до моделі, а частково знайомий —
+    вимагає перекладу лише нових речень.
+    """
+
+    MEMORY_SIZE = 10_000
+    DB_PATH = ".cache/translation_memory.sqlite3"
+
+    def __init__(self, path: str = DB_PATH):
+        """Створює пам'ять з дисковим рівнем у файлі path."""
+        self.path = path
+        self._memory = OrderedDict()  # (lang, segment) -> переклад
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # --- Дисковий рівень (виконується в пулі потоків) ---
+
+    def _connection(self) -> sqlite3.Connection:
+        """Відкриває базу та створює таблицю (один раз)."""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                "lang TEXT NOT NULL, segment TEXT NOT NULL, "
+                "translation TEXT NOT NULL, PRIMARY KEY (lang, segment))"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _read(self, lang: str, segments: List[str]) -> dict:
+        """Читає переклади сегментів з диска."""
+        placeholders = ", ".join("?" * len(segments))
+        with self._db_lock:
+            rows = self._connection().execute(
+                "SELECT segment, translation FROM translations "
+                f"WHERE lang = ? AND segment IN ({placeholders})",
+                (lang, *segments),
+            ).fetchall()
+        return dict(rows)
+
+    def _write(self, lang: str, pairs: List[Tuple[str, str]]) -> None:
+        """Записує переклади на диск однією транзакцією."""
+        with self._db_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO translations "
+                    "(lang, segment, translation) VALUES (?, ?, ?)",
+                    [(lang, segment, translation) for segment, translation in pairs],
+                )
+
+    # --- Інтерфейс ---
+
+    def _remember(self, key: tuple, translation: str) -> None:
+        """Кладе переклад у LRU, витісняючи найдавніші записи."""
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.MEMORY_SIZE:
+            self._memory.popitem(last=False)
+
+    async def lookup(self, lang: str, segments: List[str]) -> List[Optional[str]]:
+        """
+        Шукає переклади сегментів: спочатку в пам'яті, потім на диску.
+
+        Returns:
+            Переклади в порядку сегментів (None — перекладу немає)
+        """
+        keys = [normalize_segment(segment) for segment in segments]
+        found = {}
+        for key in keys:
+            translation = self._memory.get((lang, key))
+            if translation is not None:
+                self._memory.move_to_end((lang, key))
+                found[key] = translation
+
+        missing = list({key for key in keys if key not in found})
+        if missing:
+            try:
+                stored = await asyncio.get_running_loop().run_in_executor(
+                    None, self._read, lang, missing
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Помилка читання {self.path}: {e}")
+                stored = {}
+            for key, translation in stored.items():
+                self._remember((lang, key), translation)
+            found.update(stored)
+
+        result = [found.get(key) for key in keys]
+        hits = sum(1 for translation in result if translation is not None)
+        self.hits += hits
+        self.misses += len(result) - hits
+        return result
+
+    async def store(self, lang: str, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Зберігає пари (сегмент, переклад) в обох рівнях."""
+        normalized = [
+            (normalize_segment(segment), translation.strip())
+            for segment, translation in pairs
+            if segment.strip() and translation.strip()
+        ]
+        if not normalized:
+            return
+        for key, translation in normalized:
+            self._remember((lang, key), translation)
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self._write, lang, normalized
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Помилка запису {self.path}: {e}")
+
+    def close(self) -> None:
+        """Закриває базу."""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+translation_memory = TranslationMemory()
+
+
+async def translate_cached(
+    lang_name: str, text: str, hint: str = ""
+) -> Optional[str]:
+    """
+    Перекладає текст з пам'яті перекладів.
+
+    Знайдені речення беруться з кешу, решта перекладається одним
+    запитом до моделі (hint додається до промпту), після чого текст
+    збирається у вихідному порядку.
+
+    Returns:
+        Переклад або None, якщо жодного речення немає в пам'яті
+        (тоді викликач перекладає текст повністю, потоково)
+    """
+    whole = await translation_memory.lookup(lang_name, [text])
+    if whole[0] is not None:
+        return whole[0]
+
+    segments, separators = split_segments(text)
+    translatable = [
+        index for index, segment in enumerate(segments)
+        if needs_translation(segment)
+    ]
+    if not translatable:
+        return text
+
+    cached = await translation_memory.lookup(
+        lang_name, [segments[index] for index in translatable]
+    )
+    missing = [
+        index for index, translation in zip(translatable, cached)
+        if translation is None
+    ]
+    if len(missing) == len(translatable):
+        return None
+
+    translated = list(segments)
+    for index, translation in zip(translatable, cached):
+        if translation is not None:
+            translated[index] = translation
+
+    if missing:
+        prompt = ResourceLoader.format_prompt(
+            "translate_segments", lang_name=lang_name
+        ) + hint
+        sources = [segments[index] for index in missing]
+        results = await translate_segments(prompt, sources)
+        if results is None:
+            return None
+        for index, translation in zip(missing, results):
+            translated[index] = translation
+        await translation_memory.store(lang_name, zip(sources, results))
+
+    result = join_segments(translated, separators)
+    await translation_memory.store(lang_name, [(text, result)])
+    return result
+
+
+async def remember_translation(lang_name: str, text: str, translation: str) -> None:
+    """
+    Зберігає повний переклад тексту в пам'ять перекладів.
+
+    Якщо кількість речень оригіналу й перекладу збігається, речення
+    зберігаються також окремо — для повторного використання в інших
+    текстах.
+    """
+    if not translation or translation.startswith("⚠️"):
+        return
+    pairs = [(text, translation)]
+
+    segments, _ = split_segments(text.strip())
+    results, _ = split_segments(translation.strip())
+    if len(segments) > 1 and len(segments) == len(results):
+        pairs.extend(
+            (segment, result)
+            for segment, result in zip(segments, results)
+            if needs_translation(segment)
+        )
+    await translation_memory.store(lang_name, pairs)
+
+
+async def translate_long(
+    lang_name: str, prompt: str, text: str, hint: str = ""
+) -> AsyncIterator[str]:
+    """
+    Перекладає довгий текст частинами паралельно.
+
+    Частини (див. split_chunks) перекладаються одночасно, не більше
+    MAX_PARALLEL_CHUNKS запитів, кожна — з урахуванням пам'яті
+    перекладів, а віддаються по черзі у вихідному порядку, щойно
+    готова чергова частина.
+
+    Yields:
+        Переклади частин разом з роздільниками між ними
+    """
+    chunks, separators = split_chunks(text)
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_CHUNKS)
+
+    async def translate_chunk(chunk: str) -> str:
+        async with semaphore:
+            cached = await translate_cached(lang_name, chunk, hint)
+            if cached is not None:
+                return cached
+            translation = await translate_text(prompt, chunk)
+            await remember_translation(lang_name, chunk, translation)
+            return translation
+
+    tasks = [asyncio.ensure_future(translate_chunk(chunk)) for chunk in chunks]
+    try:
+        for index, task in enumerate(tasks):
+            yield await task
+            if index < len(separators):
+                yield separators[index]
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,18 +1,70 @@
 """Утиліти для роботи з ресурсами та файлами."""
 import os
+import json
+import glob
+import string
+import time
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+from collections import OrderedDict, deque
+from typing import Dict, Hashable, Iterable, Optional
 
 logger = logging.getLogger(__name__)
 
 
+class PromptTemplate:
+    """Попередньо розібраний шаблон у форматі str.format."""
+
+    __slots__ = ("text", "_parts")
+
+    def __init__(self, text: str):
+        """Розбирає шаблон один раз при завантаженні."""
+        self.text = text
+        try:
+            parts = list(string.Formatter().parse(text))
+        except ValueError:
+            parts = None
+
+        # Швидкий шлях лише для простих полів виду {name}
+        if parts is not None and all(
+            field is None
+            or (field.isidentifier() and not spec and not conversion)
+            for _, field, spec, conversion in parts
+        ):
+            self._parts = tuple((literal, field) for literal, field, _, _ in parts)
+        else:
+            self._parts = None
+
+    def render(self, **kwargs) -> str:
+        """Підставляє значення в шаблон."""
+        if self._parts is None:
+            return self.text.format(**kwargs)
+
+        result = []
+        for literal, field in self._parts:
+            result.append(literal)
+            if field is not None:
+                result.append(str(kwargs[field]))
+        return "".join(result)
+
+
 class ResourceLoader:
-    """Клас для завантаження ресурсів з файлів."""
+    """
+    Клас для завантаження ресурсів з файлів.
+
+    Повідомлення та промпти читаються з диску один раз і далі віддаються
+    з пам'яті. Фонове завдання watch() перевіряє mtime файлів і
+    перечитує змінені, тож правки промптів діють без перезапуску.
+    """
 
     MESSAGES_DIR = "resources/messages"
     PROMPTS_DIR = "resources/prompts"
     IMAGES_DIR = "resources/images"
 
+    # Інтервал перевірки змін файлів (секунди)
+    RELOAD_INTERVAL = 2.0
+
     DEFAULT_MESSAGES = {
         "main": "👋 *Привіт!* Я твій AI-асистент.\n\nОбери дію нижче:",
         "random": "🎲 *Випадковий факт*\n\nЗараз згенерую цікавий факт!",
@@ -25,29 +77,126 @@ class ResourceLoader:
 
     DEFAULT_PROMPT = "Ти дружній асистент. Відповідай українською мовою."
 
+    # path -> (mtime_ns, PromptTemplate)
+    _cache: dict = {}
+    _preloaded = False
+
     @classmethod
-    def load_message(cls, name: str) -> str:
-        """Завантажує текст повідомлення з файлу."""
-        path = f"{cls.MESSAGES_DIR}/{name}.txt"
+    def _read(cls, path: str) -> Optional[PromptTemplate]:
+        """Читає файл з диску та кладе його в кеш."""
         try:
+            mtime_ns = os.stat(path).st_mtime_ns
             with open(path, "r", encoding="utf-8") as f:
-                return f.read().strip()
+                template = PromptTemplate(f.read().strip())
         except FileNotFoundError:
+            cls._cache.pop(path, None)
+            return None
+        cls._cache[path] = (mtime_ns, template)
+        return template
+
+    @classmethod
+    def _get(cls, path: str) -> Optional[PromptTemplate]:
+        """Повертає шаблон з кешу (з диску лише до preload())."""
+        entry = cls._cache.get(path)
+        if entry:
+            return entry[1]
+        if cls._preloaded:
+            # Після preload() нові файли підхоплює reload_changed()
+            return None
+        return cls._read(path)
+
+    @classmethod
+    def _paths(cls) -> list:
+        """Повертає шляхи всіх текстових ресурсів."""
+        paths = []
+        for directory in (cls.MESSAGES_DIR, cls.PROMPTS_DIR):
+            paths.extend(glob.glob(f"{directory}/*.txt"))
+        return paths
+
+    @classmethod
+    def preload(cls) -> int:
+        """Завантажує всі повідомлення та промпти в пам'ять."""
+        for path in cls._paths():
+            cls._read(path)
+        cls._preloaded = True
+        logger.info(f"Завантажено ресурсів: {len(cls._cache)}")
+        return len(cls._cache)
+
+    @classmethod
+    def reload_changed(cls) -> list:
+        """Перечитує нові та змінені файли, прибирає видалені."""
+        changed = []
+        paths = set(cls._paths())
+        for path in paths:
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = cls._cache.get(path)
+            if entry is None or entry[0] != mtime_ns:
+                cls._read(path)
+                changed.append(path)
+
+        for path in set(cls._cache) - paths:
+            del cls._cache[path]
+            changed.append(path)
+
+        if changed:
+            logger.info(f"Перезавантажено ресурси: {', '.join(sorted(changed))}")
+        return changed
+
+    @classmethod
+    async def watch(cls, interval: float = None) -> None:
+        """Фонове завдання: періодично перевіряє зміни файлів."""
+        interval = interval or cls.RELOAD_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                cls.reload_changed()
+            except Exception as e:
+                logger.error(f"Помилка перезавантаження ресурсів: {e}", exc_info=True)
+
+    @classmethod
+    def _message_template(cls, name: str) -> PromptTemplate:
+        """Повертає шаблон повідомлення (або значення за замовчуванням)."""
+        path = f"{cls.MESSAGES_DIR}/{name}.txt"
+        template = cls._get(path)
+        if template is None:
             logger.warning(f"Файл {path} не знайдено")
-            return cls.DEFAULT_MESSAGES.get(
-                name, f"Повідомлення для {name}"
+            return PromptTemplate(
+                cls.DEFAULT_MESSAGES.get(name, f"Повідомлення для {name}")
             )
+        return template
 
     @classmethod
-    def load_prompt(cls, name: str) -> str:
-        """Завантажує промпт з файлу."""
+    def _prompt_template(cls, name: str) -> PromptTemplate:
+        """Повертає шаблон промпту (або промпт за замовчуванням)."""
         path = f"{cls.PROMPTS_DIR}/{name}.txt"
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                return f.read().strip()
-        except FileNotFoundError:
+        template = cls._get(path)
+        if template is None:
             logger.error(f"Файл {path} не знайдено!")
-            return cls.DEFAULT_PROMPT
+            return PromptTemplate(cls.DEFAULT_PROMPT)
+        return template
+
+    @classmethod
+    def load_message(cls, name: str) -> str:
+        """Повертає текст повідомлення."""
+        return cls._message_template(name).text
+
+    @classmethod
+    def load_prompt(cls, name: str) -> str:
+        """Повертає текст промпту."""
+        return cls._prompt_template(name).text
+
+    @classmethod
+    def format_message(cls, resource: str, /, **kwargs) -> str:
+        """Повертає повідомлення з підставленими значеннями."""
+        return cls._message_template(resource).render(**kwargs)
+
+    @classmethod
+    def format_prompt(cls, resource: str, /, **kwargs) -> str:
+        """Повертає промпт з підставленими значеннями."""
+        return cls._prompt_template(resource).render(**kwargs)
 
     @classmethod
     def get_image_path(cls, name: str) -> Optional[str]:
@@ -55,3 +204,349 @@ class ResourceLoader:
         path = f"{cls.IMAGES_DIR}/{name}.jpg"
         return path if os.path.exists(path) else None
 
+
+class ImageCache:
+    """
+    Постійний кеш file_id зображень, вже завантажених у Telegram.
+
+    Запис прив'язаний до SHA-256 вмісту файлу, тому зміна зображення
+    автоматично інвалідує збережений file_id.
+    """
+
+    CACHE_PATH = ".cache/image_file_ids.json"
+
+    _entries: Optional[dict] = None  # name -> {"hash": ..., "file_id": ...}
+    _hashes: dict = {}  # path -> (mtime_ns, size, sha256)
+
+    @classmethod
+    def _load(cls) -> dict:
+        """Завантажує кеш з диску (один раз на процес)."""
+        if cls._entries is None:
+            try:
+                with open(cls.CACHE_PATH, "r", encoding="utf-8") as f:
+                    cls._entries = json.load(f)
+            except FileNotFoundError:
+                cls._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не вдалося прочитати {cls.CACHE_PATH}: {e}")
+                cls._entries = {}
+        return cls._entries
+
+    @classmethod
+    def _save(cls) -> None:
+        """Атомарно записує кеш на диск."""
+        os.makedirs(os.path.dirname(cls.CACHE_PATH), exist_ok=True)
+        tmp_path = f"{cls.CACHE_PATH}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cls._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, cls.CACHE_PATH)
+        except OSError as e:
+            logger.error(f"Не вдалося зберегти {cls.CACHE_PATH}: {e}")
+
+    @classmethod
+    def file_hash(cls, path: str) -> str:
+        """Повертає SHA-256 файлу (перераховується лише при зміні файлу)."""
+        stat = os.stat(path)
+        cached = cls._hashes.get(path)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        cls._hashes[path] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    @classmethod
+    def get(cls, name: str, path: str) -> Optional[str]:
+        """Повертає file_id, якщо він є і файл не змінився."""
+        entry = cls._load().get(name)
+        if entry and entry.get("hash") == cls.file_hash(path):
+            return entry.get("file_id")
+        return None
+
+    @classmethod
+    def put(cls, name: str, path: str, file_id: str) -> None:
+        """Зберігає file_id для зображення."""
+        cls._load()[name] = {"hash": cls.file_hash(path), "file_id": file_id}
+        cls._save()
+
+    @classmethod
+    def invalidate(cls, name: str) -> None:
+        """Видаляє file_id (наприклад, якщо Telegram його не прийняв)."""
+        if cls._load().pop(name, None) is not None:
+            cls._save()
+
+    @classmethod
+    async def warm_up(cls, bot, chat_id, rate_limit_args=None) -> int:
+        """
+        Попередньо завантажує в Telegram усі зображення без file_id.
+
+        Фото надсилаються у службовий чат і одразу видаляються;
+        rate_limit_args передається rate limiter бота (пріоритет запитів).
+
+        Returns:
+            Кількість завантажених зображень
+        """
+        # Імпорт тут, щоб уникнути циклічного імпорту utils <-> images
+        from images import image_store
+
+        uploaded = 0
+        pattern = os.path.join(ResourceLoader.IMAGES_DIR, "*.jpg")
+        for path in sorted(glob.glob(pattern)):
+            name = os.path.splitext(os.path.basename(path))[0]
+            if cls.get(name, path):
+                continue
+            try:
+                message = await bot.send_photo(
+                    chat_id=chat_id,
+                    photo=image_store.get(name, path),
+                    disable_notification=True,
+                    rate_limit_args=rate_limit_args,
+                )
+                cls.put(name, path, message.photo[-1].file_id)
+                uploaded += 1
+                await bot.delete_message(
+                    chat_id=chat_id,
+                    message_id=message.message_id,
+                    rate_limit_args=rate_limit_args,
+                )
+            except Exception as e:
+                logger.error(f"Помилка прогріву зображення {name}: {e}")
+        return uploaded
+
+
+class TokenBucket:
+    """
+    Відро токенів: до capacity одиниць, що поповнюються зі швидкістю rate/с.
+
+    Рівень може ставати від'ємним (consume понад доступне) — так
+    враховується борг, коли фактичні витрати виявились більшими за оцінку.
+    """
+
+    __slots__ = ("capacity", "rate", "_level", "_updated")
+
+    def __init__(self, capacity: float, rate: float):
+        """Створює повне відро."""
+        self.capacity = capacity
+        self.rate = rate
+        self._level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        """Додає токени, накопичені з моменту останнього звернення."""
+        now = time.monotonic()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    @property
+    def level(self) -> float:
+        """Поточна кількість доступних токенів."""
+        self._refill()
+        return self._level
+
+    def delay(self, amount: float = 1) -> float:
+        """Скільки секунд чекати, доки стане доступно amount токенів."""
+        self._refill()
+        if self._level >= amount:
+            return 0.0
+        return (amount - self._level) / self.rate
+
+    def consume(self, amount: float = 1) -> None:
+        """Забирає amount токенів (від'ємне значення повертає їх у відро)."""
+        self._refill()
+        self._level = min(self.capacity, self._level - amount)
+
+
+class FairScheduler:
+    """
+    Черга дозволів з пріоритетами, чергуванням ключів та паузою після 429.
+
+    Спільне ядро обмежувачів запитів: запит з ключем (користувач, чат)
+    і вартістю отримує дозвіл одразу, якщо ліміти дозволяють і черга
+    порожня, інакше чекає. Серед тих, хто чекає, менший пріоритет
+    обслуговується раніше, а всередині пріоритету ключі йдуть по колу,
+    тож один активний ключ не витісняє решту.
+
+    Підкласи задають лише політику відер: _delay() та _consume().
+    HEAD_OF_LINE — ліміти спільні для всіх ключів, тож чекає лише перший
+    у черзі; інакше (власні відра ключів) готовий запит іншого ключа
+    може пройти раніше.
+    """
+
+    HEAD_OF_LINE = False
+    # Назва черги та підписи пріоритетів для log_metrics
+    NAME = "Черга"
+    PRIORITY_NAMES: Dict[int, str] = {}
+
+    def __init__(self, priorities: Iterable[int]):
+        """Створює порожню чергу з переліком пріоритетів (від важливішого)."""
+        # priority -> key -> deque[(future, cost)]
+        self._queues = {priority: OrderedDict() for priority in sorted(priorities)}
+        self._fallback = max(self._queues)
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.queued = 0
+        # Метрики за поточне вікно логування (див. log_metrics)
+        self.sent = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.flood_waits = 0
+
+    # --- Політика лімітів (підкласи) ---
+
+    def _delay(self, key: Hashable, cost: float) -> float:
+        """Скільки чекати, доки ліміти дозволять запит."""
+        raise NotImplementedError
+
+    def _consume(self, key: Hashable, cost: float) -> None:
+        """Списує запит з лімітів."""
+        raise NotImplementedError
+
+    # --- Черга ---
+
+    def _wait_time(self, key: Hashable, cost: float) -> float:
+        """Затримка з урахуванням паузи після 429."""
+        return max(self._paused_until - time.monotonic(), self._delay(key, cost))
+
+    def _next(self):
+        """
+        Знаходить запит, який можна пропустити зараз.
+
+        Returns:
+            (keys, key, pending, 0) для готового запиту або
+            (None, None, None, затримка до найближчого; None — черга порожня)
+        """
+        soonest = None
+        for keys in self._queues.values():
+            for key, pending in list(keys.items()):
+                while pending and pending[0][0].done():
+                    # Викликач скасував очікування
+                    pending.popleft()
+                    self.queued -= 1
+                if not pending:
+                    del keys[key]
+                    continue
+                delay = self._wait_time(key, pending[0][1])
+                if delay <= 0:
+                    return keys, key, pending, 0.0
+                soonest = delay if soonest is None else min(soonest, delay)
+                if self.HEAD_OF_LINE:
+                    return None, None, None, soonest
+        return None, None, None, soonest
+
+    async def acquire(
+        self, key: Hashable, cost: float = 1, priority: Optional[int] = None
+    ) -> None:
+        """Чекає, доки запит ключа key вартістю cost вкладеться в ліміти."""
+        started = time.monotonic()
+        if not self.queued and self._wait_time(key, cost) <= 0:
+            self._consume(key, cost)
+            self._record_wait(0.0)
+            return
+
+        if self._dispatcher is None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        future = asyncio.get_running_loop().create_future()
+        keys = self._queues.get(priority, self._queues[self._fallback])
+        keys.setdefault(key, deque()).append((future, cost))
+        self.queued += 1
+        self._wakeup.set()
+        await future
+        self._record_wait(time.monotonic() - started)
+
+    async def _dispatch(self) -> None:
+        """Видає дозволи запитам з черги в міру поповнення лімітів."""
+        while True:
+            keys, key, pending, delay = self._next()
+            if keys is None:
+                # Прокидаємось раніше, якщо з'явиться новий запит
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            future, cost = pending.popleft()
+            self.queued -= 1
+            keys.move_to_end(key)
+            self._consume(key, cost)
+            future.set_result(None)
+
+    def backoff(self, seconds: float) -> None:
+        """Призупиняє видачу дозволів після відповіді 429."""
+        self.flood_waits += 1
+        self._paused_until = max(
+            self._paused_until, time.monotonic() + seconds
+        )
+
+    def waiting_keys(self) -> set:
+        """Ключі, запити яких зараз чекають у черзі."""
+        return {key for keys in self._queues.values() for key in keys}
+
+    async def close(self) -> None:
+        """Зупиняє диспетчер і скасовує запити, що чекають."""
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        for keys in self._queues.values():
+            for pending in keys.values():
+                for future, _ in pending:
+                    future.cancel()
+            keys.clear()
+        self.queued = 0
+
+    # --- Метрики ---
+
+    def _record_wait(self, waited: float) -> None:
+        """Враховує час очікування запиту в черзі."""
+        self.sent += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        if waited > 0.001:
+            self.delayed += 1
+
+    def queue_depths(self) -> Dict[int, int]:
+        """Кількість запитів, що чекають, за пріоритетами."""
+        return {
+            priority: sum(len(pending) for pending in keys.values())
+            for priority, keys in self._queues.items()
+        }
+
+    def metrics(self) -> dict:
+        """Зведені метрики черги для логування."""
+        return {
+            "queues": self.queue_depths(),
+            "sent": self.sent,
+            "delayed": self.delayed,
+            "avg_wait": self.total_wait / self.sent if self.sent else 0.0,
+            "max_wait": self.max_wait,
+            "flood_waits": self.flood_waits,
+        }
+
+    async def log_metrics(self, interval: float = 60.0) -> None:
+        """Періодично пише метрики черги в лог (фонове завдання)."""
+        while True:
+            await asyncio.sleep(interval)
+            stats = self.metrics()
+            if stats["delayed"] or stats["flood_waits"]:
+                depths = ", ".join(
+                    f"{self.PRIORITY_NAMES.get(priority, priority)} {depth}"
+                    for priority, depth in stats["queues"].items()
+                )
+                logger.info(
+                    f"{self.NAME}: {depths}; надіслано {stats['sent']}, "
+                    f"з очікуванням {stats['delayed']}, середнє "
+                    f"{stats['avg_wait']:.2f} с, найдовше "
+                    f"{stats['max_wait']:.2f} с, 429: {stats['flood_waits']}"
+                )
+            self.sent = self.delayed = self.flood_waits = 0
+            self.total_wait = self.max_wait = 0.0